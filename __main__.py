@@ -53,6 +53,7 @@ def test_costFunctions():
     timeLimitRp=30 
     gapRp=0.00001 
     threadsRp=8 
+    selector='milp' #selection of the representative periods: 'milp' (optimal, CPLEX) or 'heuristic' (fast, for exploratory runs)
 
     #Cost functions computation parameters
     nbTimeStepsForComputations=8736 #size of the data serie used to compute the cost functions (hours)
@@ -67,6 +68,7 @@ def test_costFunctions():
     gap='1.e-4' 
     timeLimit='600' 
     converterState=True #whether to compute the cost functions for both initial states of the converter or not
+    workers=1 #number of Persee runs launched in parallel (each worker uses its own copy of the Persee files)
         
     #Building cost functions
     cf=costFunctions(periodSizes, seriesToConsider,
@@ -74,11 +76,11 @@ def test_costFunctions():
                  storageID, lossesID, efficiencyID, initSocID, finalSocID, capacityID, powerID, costID, 
                  nbTimeStepsForComputations, dt, converterState)
 
-    cf.computeRp(nRP, sRP, weights, imposedPeriods, imposePeak, gapRp, timeLimitRp, threadsRp, nBins, binMethod)
+    cf.computeRp(nRP, sRP, weights, imposedPeriods, imposePeak, gapRp, timeLimitRp, threadsRp, nBins, binMethod, selector=selector)
 
     cf.defineStorageLevelDeltas(nbPoints, maxStorageDeltaPerPeriod)
 
-    cf.computeCf(nameBatch, gap, timeLimit, initSOC, converterID, absInitialStateID)    
+    cf.computeCf(nameBatch, gap, timeLimit, initSOC, converterID, absInitialStateID, workers)    
 
     cf.extrapolateCf()
 
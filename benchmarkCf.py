@@ -0,0 +1,168 @@
+import os
+import io
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+
+os.chdir(os.path.dirname(os.path.realpath(__file__)))
+from costFunctions import costFunctions
+
+standInOptions={'sleep':'PERSEE_STANDIN_SLEEP', 'timeLimitRate':'PERSEE_STANDIN_TIMELIMIT_RATE',
+                'unknownRate':'PERSEE_STANDIN_UNKNOWN_RATE', 'seed':'PERSEE_STANDIN_SEED', 'costID':'PERSEE_STANDIN_COSTID',
+                'maxDelta':'PERSEE_STANDIN_MAX_DELTA'}
+
+def benchmarkCf(periodSizes=672, nbPoints=2, nRP=2, sRP=2, workers=1, converterState=True, cache=None,
+                sleep=0., timeLimitRate=0., unknownRate=0., seed=0, descSize=2000, loc=None, keep=False, verbose=False, adaptive=False, maxDelta=None, pruneInfeasible=False,
+                selector='heuristic'):
+    """Runs the whole cost functions computation (representative periods, cost functions, extrapolation, writing) on synthetic data,
+    with the Persee stand-in (perseeStandIn.py) instead of Persee, and reports:
+        - the number of Persee runs per second
+        - the orchestration overhead per case (everything but Persee itself: files modifications and writing, cache, gathering of the results)
+        - the time spent in each phase
+    The synthetic Persee folder is created in 'loc' (a temporary folder by default, removed at the end unless 'keep' is True),
+    'descSize' is the number of additional lines in the desc.xml file (Persee description files can be large),
+    the storage deltas are refined adaptively if 'adaptive' is True, runs with a storage level variation above 'maxDelta' (state of charge) are unfeasible,
+    the storage deltas beyond the infeasibility frontier are skipped if 'pruneInfeasible' is True,
+    the representative periods are selected with 'selector' (see computeRp): the heuristic by default, that does not need CPLEX, or 'milp'.
+    Returns the statistics (dictionary)"""
+
+    temporary=loc is None
+    if temporary:
+        loc=tempfile.mkdtemp(prefix='benchmarkCf_')
+    writeSyntheticPersee(loc, seed, descSize)
+
+    costID='UnDiscounted Net OPEX ;'
+    options={'sleep':sleep, 'timeLimitRate':timeLimitRate, 'unknownRate':unknownRate, 'seed':seed, 'costID':costID, 'maxDelta':'' if maxDelta is None else maxDelta}
+    previousEnviron={name:os.environ.get(name) for name in standInOptions.values()}
+    for option in options:
+        os.environ[standInOptions[option]]=str(options[option])
+
+    phases={}
+    quiet=contextlib.redirect_stdout(io.StringIO()) if not verbose else contextlib.nullcontext()
+    try:
+        with quiet:
+            timePhase=time.perf_counter()
+            cf=costFunctions(periodSizes, ['Thermal_Load','Thermal_Solar'],
+                             loc, 'dataSeries.csv', 'config.xml', 'settings.ini', 'desc.xml', 'results_PLAN.csv', 'FbsfFramework.log', 'perseeProject.csv',
+                             'LTS', '.KLoss', '.Eta', '.InitSOC', '.FinalSOC', '.MaxEsto', '.MaxFlow', costID,
+                             8736, 1, converterState)
+            phases['init']=time.perf_counter()-timePhase
+
+            timePhase=time.perf_counter()
+            cf.computeRp(nRP, sRP, [2,1], [], [], 0.0001, 30, 8, 40, 1, selector=selector)
+            phases['computeRp']=time.perf_counter()-timePhase
+
+            timePhase=time.perf_counter()
+            cf.defineStorageLevelDeltas(nbPoints, 1)
+            phases['defineStorageLevelDeltas']=time.perf_counter()-timePhase
+
+            timePhase=time.perf_counter()
+            cf.computeCf('perseeStandIn.py', '1.e-4', '600', 0.1, 'IFP', '.AbsInitialState', workers, cache, adaptive=adaptive, pruneInfeasible=pruneInfeasible)
+            phases['computeCf']=time.perf_counter()-timePhase
+
+            timePhase=time.perf_counter()
+            cf.extrapolateCf()
+            phases['extrapolateCf']=time.perf_counter()-timePhase
+
+            timePhase=time.perf_counter()
+            cf.writeCf('benchmark', saveExtrapolated=True)
+            phases['writeCf']=time.perf_counter()-timePhase
+    finally:
+        for name in previousEnviron:
+            if previousEnviron[name] is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name]=previousEnviron[name]
+        if temporary and not keep:
+            shutil.rmtree(loc, ignore_errors=True)
+
+    stats=dict(cf.cfStats)
+    stats['phases']=phases
+    stats['computeCfPhases']=cf.cfStats['phases']
+    stats['runsPerSecond']=stats['runs']/stats['computeCfPhases']['runs'] if stats['computeCfPhases']['runs'] > 0 else 0.
+    stats['perseeTimePerRun']=stats['perseeTime']/stats['runs'] if stats['runs'] > 0 else 0.
+    stats['overheadPerCase']=0.
+    if stats['cases'] > 0:
+        #time spent in the cases outside of Persee, plus time spent in the main process to prepare the runs and gather the results
+        stats['overheadPerCase']=((stats['caseTime']-stats['perseeTime'])+stats['computeCfPhases']['preparation']+stats['computeCfPhases']['aggregation'])/stats['cases']
+    stats['loc']=loc
+
+    showBenchmark(stats, sleep)
+    return stats
+
+def showBenchmark(stats, sleep=0.):
+    print("------------> cost functions benchmark")
+    print("Storage deltas:",stats['points'],", cases:",stats['cases'],", Persee runs:",stats['runs'],", skipped runs:",stats['skippedRuns'],", cache hits:",stats['cached'],", workers:",stats['workers'])
+    print("Persee runs per second:",round(stats['runsPerSecond'],2))
+    print("Persee time per run:",round(stats['perseeTimePerRun']*1000,2),"ms (stand-in sleep:",round(sleep*1000,2),"ms)")
+    print("Orchestration overhead per case:",round(stats['overheadPerCase']*1000,2),"ms")
+    for phase in stats['phases']:
+        print("   ",phase,":",round(stats['phases'][phase],3),"s")
+    for phase in stats['computeCfPhases']:
+        print("    computeCf -",phase,":",round(stats['computeCfPhases'][phase],3),"s")
+
+def writeSyntheticPersee(loc, seed=0, descSize=2000):
+
+    #one year of hourly data: heat load and solar production (kW), and an electric load that is not used for the representative periods
+    rng=np.random.default_rng(seed)
+    hours=np.arange(8760)
+    thermalLoad=100+40*np.cos(2*np.pi*(hours%24-19)/24)+30*np.cos(2*np.pi*hours/8760)+rng.normal(0,5,8760)
+    thermalSolar=np.maximum(0,80*np.sin(np.pi*(hours%24-6)/12))*(0.7-0.3*np.cos(2*np.pi*hours/8760))*rng.uniform(0.5,1,8760)
+    elecLoad=50+10*np.sin(2*np.pi*hours/24)+rng.normal(0,2,8760)
+
+    lines=['Time;Thermal_Load;Thermal_Solar;Elec_Load','h;kW;kW;kW','-;-;-;-','0;0;0;0']
+    for h in range(8760):
+        lines.append(str(h)+';'+'%.3f' % thermalLoad[h]+';'+'%.3f' % thermalSolar[h]+';'+'%.3f' % elecLoad[h])
+    writeLines(os.path.join(loc,'dataSeries.csv'), lines)
+
+    writeLines(os.path.join(loc,'settings.ini'), ['[Storage]','LTS.MaxEsto=2000.','LTS.MaxFlow=100.','LTS.Eta=0.9','LTS.KLoss=0.001','LTS.InitSOC=0.5','LTS.FinalSOC=0.5',
+                                                  '[Converter]','IFP.AbsInitialState=1','IFP.State=1',
+                                                  '[Cplex]','Cplex.Gap=1.e-3','Cplex.TimeLimit=3600',
+                                                  '[Previsions]','LoadFlux.SeasonalPrevisions=true','BuyPrice.SeasonalPrevisions=true'])
+
+    writeLines(os.path.join(loc,'config.xml'), ['<?xml version="1.0" encoding="UTF-8"?>','<Config>','    <futursize>8760</futursize>','    <pastsize>0</pastsize>',
+                                                '    <timeshift>24</timeshift>','    <CycleStop>0</CycleStop>','    <TimeStepFile>timeSteps.csv</TimeStepFile>',
+                                                '    <ComputationFuturSize>8760</ComputationFuturSize>','    <MyTypicalPeriod>0</MyTypicalPeriod>',
+                                                '    <DataFile>dataSeries.csv</DataFile>','</Config>'])
+
+    desc=['<?xml version="1.0" encoding="UTF-8"?>','<Description>','    <UseProfileLoadFluxSeasonal>1</UseProfileLoadFluxSeasonal>',
+          '    <UseProfileBuyPriceSeasonal>1</UseProfileBuyPriceSeasonal>','    <UseGridCarbonContentSeasonal>1</UseGridCarbonContentSeasonal>']
+    for i in range(descSize):
+        desc.append('    <Component'+str(i%50)+'Param'+str(i)+'>'+str(i)+'</Component'+str(i%50)+'Param'+str(i)+'>')
+    desc.append('</Description>')
+    writeLines(os.path.join(loc,'desc.xml'), desc)
+
+    shutil.copy(os.path.join(os.path.dirname(os.path.realpath(__file__)),'perseeStandIn.py'), os.path.join(loc,'perseeStandIn.py'))
+
+def writeLines(path, lines):
+    file=open(path,'w')
+    file.write('\n'.join(lines)+'\n')
+    file.close()
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description='Benchmark of the cost functions computation, with a stand-in for Persee')
+    parser.add_argument('--periodSizes', type=int, nargs='+', default=[672])
+    parser.add_argument('--nbPoints', type=int, default=2)
+    parser.add_argument('--nRP', type=int, default=2)
+    parser.add_argument('--sRP', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--sleep', type=float, default=0.)
+    parser.add_argument('--timeLimitRate', type=float, default=0.)
+    parser.add_argument('--unknownRate', type=float, default=0.)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--descSize', type=int, default=2000)
+    parser.add_argument('--loc', default=None)
+    parser.add_argument('--keep', action='store_true')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--adaptive', action='store_true')
+    parser.add_argument('--maxDelta', type=float, default=None)
+    parser.add_argument('--prune', action='store_true')
+    parser.add_argument('--selector', choices=['heuristic','milp'], default='heuristic')
+    args=parser.parse_args()
+
+    benchmarkCf(args.periodSizes, args.nbPoints, args.nRP, args.sRP, args.workers, True, None,
+                args.sleep, args.timeLimitRate, args.unknownRate, args.seed, args.descSize, args.loc, args.keep, args.verbose, args.adaptive, args.maxDelta, args.prune,
+                args.selector)
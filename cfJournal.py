@@ -0,0 +1,97 @@
+import os
+import json
+from sqliteStore import contentKey
+
+class cfJournal:
+
+    """A durable journal of a cost functions computation, to resume it after a crash and to use partial results.
+        The journal is an append-only JSON Lines file, each record is written and flushed to disk (fsync) as soon as it is known:
+
+            - a first record: type 'header', with a hash of the inputs of the computation (Persee files, gap, time limit, representative periods...)
+            - one record per Persee run done: type 'case', with the case (set of periods, period, storage delta, representative period,
+              initial state of the converter, storage levels, data file) and its result (computation time or -1/-2, cost)
+            - one record per storage delta whose cost is computed: type 'point', with the costs (converter ON and OFF)
+
+        A journal only makes sense for a given computation (same representative periods and Persee settings), it is emptied when a computation
+        starts without resuming, and ignored when resuming with other inputs than those of its header. The class is composed of the following attribute:
+
+            - the location of the journal (a .jsonl file): path
+    """
+
+    def __init__(self, path):
+
+        self.path=str(path)
+
+        if os.path.dirname(self.path)!='' and not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+
+    def inputsKey(self, contents):
+        #hash of the inputs of a computation, contents: list of strings, bytes or numpy arrays, the order matters
+        return contentKey(contents)
+
+    def key(self, case):
+        #identification of a Persee run in the journal
+        return json.dumps([case['periodSet'], case['period'], case['point'], case['noRp'], case['state'], case['initSoc'], case['finalSoc'], case['rpFile']])
+
+    def append(self, record):
+        #the record is written in one call and flushed to disk before returning
+        line=(json.dumps(record)+'\n').encode('utf-8')
+        fd=os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def appendCase(self, case, result):
+        record={'type':'case'}
+        record.update(case)
+        record['timeSimulation']=result[0]
+        record['cost']=result[1]
+        self.append(record)
+
+    def appendPoint(self, periodSet, period, point, delta, cost, costOff=None):
+        self.append({'type':'point', 'periodSet':periodSet, 'period':period, 'point':point, 'delta':delta, 'cost':cost, 'costOff':costOff})
+
+    def read(self):
+        #records of the journal, in the order they were written
+        #a record interrupted while being written (last line without end of line) is removed from the file
+        if not os.path.isfile(self.path):
+            return []
+        file=open(self.path,'rb')
+        content=file.read()
+        file.close()
+
+        if len(content) > 0 and not content.endswith(b'\n'):
+            content=content[:content.rfind(b'\n')+1]
+            os.truncate(self.path, len(content))
+
+        records=[]
+        for line in content.decode('utf-8').splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print('WARNING: unreadable record ignored in the journal '+self.path)
+        return records
+
+    def results(self):
+        #results of the Persee runs in the journal: {key: [timeSimulation, cost]}
+        return {self.key(record):[record['timeSimulation'],record['cost']] for record in self.read() if record['type'] == 'case'}
+
+    def inputs(self):
+        #hash of the inputs written in the header of the journal, None if there is no header
+        records=self.read()
+        if len(records) == 0 or records[0]['type'] != 'header':
+            return None
+        return records[0]['inputs']
+
+    def points(self):
+        #costs of the storage deltas in the journal: {(periodSet, period, point): record} (the last record is kept)
+        return {(record['periodSet'],record['period'],record['point']):record for record in self.read() if record['type'] == 'point'}
+
+    def clear(self, inputs=None):
+        #the journal is emptied, then starts with a header holding the hash of the inputs of the new computation
+        file=open(self.path,'w')
+        file.close()
+        if inputs is not None:
+            self.append({'type':'header', 'inputs':inputs})
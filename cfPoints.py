@@ -0,0 +1,323 @@
+import numpy as np
+from collections import OrderedDict
+
+class cfPoints:
+
+    """A compact container for cost functions (original or extrapolated), replacing nested lists of [delta, cost] points.
+        For each set of periods, the points are stored in a single float array, with a validity mask:
+
+            - the points (storage delta, cost), of shape (periods x points x 2) for original cost functions,
+              or (periods x days x points x 2) for extrapolated cost functions: points
+            - the validity of each point, of shape (periods x points) or (periods x days x points): valid
+              (False for ignored points, when the computations failed or the problem was unfeasible, and for padding)
+
+        Points of a cost function are sorted by increasing storage delta, valid points are accessed with get(periodSet, period, day).
+    """
+
+    __slots__=('points','valid')
+
+    def __init__(self):
+        self.points=[]
+        self.valid=[]
+
+    def addPeriodSet(self, nbPeriods, nbPoints, nbDays=0, deltas=None):
+        #adds an empty set of periods (all points are invalid), storage deltas can be given (periods x points)
+        if nbDays > 0:
+            shape=(nbPeriods,nbDays,nbPoints)
+        else:
+            shape=(nbPeriods,nbPoints)
+        points=np.full(shape+(2,), np.nan)
+        if deltas is not None:
+            points[...,0]=np.asarray(deltas, dtype=float).reshape((nbPeriods,)+(1,)*(len(shape)-2)+(nbPoints,))
+        self.points.append(points)
+        self.valid.append(np.zeros(shape, dtype=bool))
+        return len(self.points)-1
+
+    def setPoint(self, periodSet, period, point, delta, cost, day=None):
+        index=(period,point) if day is None else (period,day,point)
+        self.points[periodSet][index]=[delta,cost]
+        self.valid[periodSet][index]=True
+
+    def ignorePoint(self, periodSet, period, point, day=None):
+        index=(period,point) if day is None else (period,day,point)
+        self.valid[periodSet][index]=False
+
+    def setCurve(self, periodSet, period, curve, day=None):
+        #replaces a cost function by the given points (points x 2), remaining points are marked invalid
+        curve=np.asarray(curve, dtype=float).reshape(-1,2)
+        index=(period,) if day is None else (period,day)
+        self.points[periodSet][index]=np.nan
+        self.points[periodSet][index][:len(curve)]=curve
+        self.valid[periodSet][index]=False
+        self.valid[periodSet][index][:len(curve)]=True
+
+    def get(self, periodSet, period, day=None):
+        #valid points of a cost function (points x 2)
+        index=(period,) if day is None else (period,day)
+        return self.points[periodSet][index][self.valid[periodSet][index]]
+
+    def nbPeriodSets(self):
+        return len(self.points)
+
+    def nbPeriods(self, periodSet):
+        return self.points[periodSet].shape[0]
+
+    def nbDays(self, periodSet):
+        #number of extrapolated cost functions per period (0 for original cost functions)
+        if self.points[periodSet].ndim == 4:
+            return self.points[periodSet].shape[1]
+        return 0
+
+    def toList(self):
+        #nested lists of [delta, cost] points, as previously used
+        output=[]
+        for periodSet in range(self.nbPeriodSets()):
+            output.append([])
+            for period in range(self.nbPeriods(periodSet)):
+                if self.nbDays(periodSet) > 0:
+                    output[periodSet].append([self.get(periodSet,period,day).tolist() for day in range(self.nbDays(periodSet))])
+                else:
+                    output[periodSet].append(self.get(periodSet,period).tolist())
+        return output
+
+class mixedCfPoints:
+
+    """An implicit representation of the extrapolated cost functions (the 'mixed curves'):
+        each mixed curve is a day-weighted combination of the cost functions of two consecutive periods,
+        only these two curves are kept and mixed curves are built when needed (same results as mixCurves).
+        If one of the two curves has no point (partial results), the mixed curves have no point.
+
+            - for each set of periods and each period, the two curves and whether the current period is the upper one: curves
+            - for each set of periods, the number of mixed curves per period: nbDaysInPeriod
+            - the tolerance used to match the storage deltas of both curves: absTolerance
+            - the number of recently built mixed curves that are kept: cacheSize
+    """
+
+    __slots__=('curves','nbDaysInPeriod','absTolerance','cacheSize','cache')
+
+    def __init__(self, absTolerance=5, cacheSize=64):
+        self.curves=[]
+        self.nbDaysInPeriod=[]
+        self.absTolerance=absTolerance
+        self.cacheSize=cacheSize
+        self.cache=OrderedDict()
+
+    def addPeriodSet(self, nbDaysInPeriod):
+        self.curves.append([])
+        self.nbDaysInPeriod.append(nbDaysInPeriod)
+        return len(self.curves)-1
+
+    def addPeriod(self, periodSet, curveUp, curveDown, currentUp, check=True):
+        #the curves are checked right away (an error is raised if they can not be mixed), unless they were already checked
+        if len(curveUp) == 0 or len(curveDown) == 0:
+            self.curves[periodSet].append(None)
+            return
+        if check:
+            mixCurves(curveUp,curveDown,currentUp,self.nbDaysInPeriod[periodSet],self.absTolerance,days=[0])
+        self.curves[periodSet].append([curveUp,curveDown,currentUp])
+
+    def get(self, periodSet, period, day):
+        #mixed curve (points x 2) of the given day, read-only (the curve may be kept in the cache)
+        if day < 0 or day >= self.nbDaysInPeriod[periodSet]:
+            print('ERROR: day '+str(day)+' out of the period (set of periods '+str(periodSet)+' has '+str(self.nbDaysInPeriod[periodSet])+' days per period)')
+            raise SystemExit
+        if self.curves[periodSet][period] is None:
+            return np.zeros((0,2))
+        key=(periodSet,period,day)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        curveUp,curveDown,currentUp=self.curves[periodSet][period]
+        curve=mixCurves(curveUp,curveDown,currentUp,self.nbDaysInPeriod[periodSet],self.absTolerance,days=[day])[0]
+        curve=curve[~np.isnan(curve[:,0])]
+        curve.setflags(write=False)
+
+        self.cache[key]=curve
+        if len(self.cache) > self.cacheSize:
+            self.cache.popitem(last=False)
+        return curve
+
+    def nbPeriodSets(self):
+        return len(self.curves)
+
+    def nbPeriods(self, periodSet):
+        return len(self.curves[periodSet])
+
+    def nbDays(self, periodSet):
+        return self.nbDaysInPeriod[periodSet]
+
+    def toCfPoints(self):
+        #explicit version of all the mixed curves
+        output=cfPoints()
+        for periodSet in range(self.nbPeriodSets()):
+            allWeightedFunctions=[mixCurves(curves[0],curves[1],curves[2],self.nbDaysInPeriod[periodSet],self.absTolerance) if curves is not None else np.zeros((self.nbDaysInPeriod[periodSet],0,2)) 
+                                  for curves in self.curves[periodSet]]
+            nbPoints=max([weightedFunctions.shape[1] for weightedFunctions in allWeightedFunctions]+[0])
+            output.addPeriodSet(len(allWeightedFunctions),nbPoints,self.nbDaysInPeriod[periodSet])
+            for period in range(len(allWeightedFunctions)):
+                for h in range(self.nbDaysInPeriod[periodSet]):
+                    curve=allWeightedFunctions[period][h]
+                    output.setCurve(periodSet,period,curve[~np.isnan(curve[:,0])],h)
+        return output
+
+    def toList(self):
+        return self.toCfPoints().toList()
+
+def toCfPoints(functions):
+    #builds a container from nested lists of points (original cost functions: [periodSet][period][point]
+    #or extrapolated ones: [periodSet][period][day][point]), containers are returned unchanged
+    if type(functions) == cfPoints or type(functions) == mixedCfPoints:
+        return functions
+
+    output=cfPoints()
+    for periodSet in range(len(functions)):
+        periods=functions[periodSet]
+        extrapolated=len(periods) > 0 and len(periods[0]) > 0 and len(periods[0][0]) > 0 and type(periods[0][0][0]) == list
+        if extrapolated:
+            nbDays=max([len(days) for days in periods])
+            nbPoints=max([len(curve) for days in periods for curve in days]+[0])
+            output.addPeriodSet(len(periods),nbPoints,nbDays)
+            for period in range(len(periods)):
+                for day in range(len(periods[period])):
+                    output.setCurve(periodSet,period,periods[period][day],day)
+        else:
+            nbPoints=max([len(curve) for curve in periods]+[0])
+            output.addPeriodSet(len(periods),nbPoints)
+            for period in range(len(periods)):
+                output.setCurve(periodSet,period,periods[period])
+    return output
+
+def mixCurves(curveUp,curveDown,currentUp,nbDaysInPeriod,absTolerance=5,days=None):
+    
+    #builds the mixed curves (days x points x 2) of two cost functions (points x 2), for all the days of the period at once (or for the given days only)
+    #curves with fewer points than the others are padded with NaN points (only for cost functions whose points are not evenly spaced)
+    tolerance=10**-absTolerance
+    
+    #if one curve if longer than the other on the left, this part is called the 'head', the rest is called the 'core'
+    #similarly, if one curve if longer than the other on the right, this part is called the 'tail'
+    head=False
+    if abs(curveUp[0,0]) > abs(curveDown[0,0]):
+        curveHead=curveUp
+        curveTail=curveDown
+        head=True
+    elif abs(curveUp[0,0]) < abs(curveDown[0,0]):
+        curveHead=curveDown
+        curveTail=curveUp
+        head=True
+    else: 
+        curveHead=curveUp
+        curveTail=curveDown
+    
+    #definition of the coefficients between the two functions, for each day
+    if days is None:
+        h=np.arange(nbDaysInPeriod)
+    else:
+        h=np.asarray(days)
+    if currentUp:
+        coefHead=1-h/nbDaysInPeriod
+        coefTail=h/nbDaysInPeriod
+    else:
+        coefHead=h/nbDaysInPeriod
+        coefTail=1-h/nbDaysInPeriod
+    
+    #storage deltas computed adaptively are not evenly spaced
+    if not isUniform(curveHead,curveTail,tolerance):
+        return mixCurvesNonUniform(curveHead,curveTail,coefHead,coefTail,tolerance)
+    
+    #j is the first point of the curve with a head that is in the core
+    j=0
+    if (head):
+        j=int(np.searchsorted(curveHead[:,0], curveTail[0,0]-tolerance))
+        if j >= len(curveHead)-1 or not np.isclose(curveHead[j,0], curveTail[0,0], rtol=0, atol=tolerance):
+            print('ERROR when building the head of a cost function')
+            raise SystemExit
+        
+    #building the core of each curve
+    mini=max(curveHead[:,0].min(), curveTail[:,0].min()) #minimum value excluding the head
+    maxi=min(curveHead[:,0].max(), curveTail[:,0].max()) #maximum value excluding the tail
+    
+    step=float(curveHead[1,0]-curveHead[0,0])
+    
+    nbCorePoints=int(round(float((maxi-mini)/step),absTolerance))+1
+    
+    #numerical approximations can lead to two points with strictly different x values but that can be considered as equal: hence a tolerance is considered 
+    if j+nbCorePoints > len(curveHead) or nbCorePoints > len(curveTail) or not np.allclose(curveHead[j:j+nbCorePoints,0], curveTail[:nbCorePoints,0], rtol=0, atol=tolerance):
+        print('ERROR when building the core of an extrapolated cost function')
+        raise SystemExit
+    i=j+nbCorePoints-1 #last point of the curve with a head that is in the core
+    k=len(curveTail)-1 #last point of the curve with a tail
+    
+    coreX=np.broadcast_to(curveHead[j:i+1,0], (len(h),nbCorePoints))
+    coreY=curveHead[j:i+1,1][None,:]*coefHead[:,None]+curveTail[:nbCorePoints,1][None,:]*coefTail[:,None]
+    
+    #building the edges of each curve (the head and the tail)
+    #original slopes are kept, the step on the x-axis is reduced (with the same coefficient for the head and the tail)
+    
+    #head: points are obtained going left from the first point of the core
+    slopes=(np.diff(curveHead[:j+1,1])/step)[::-1]
+    headX=np.cumsum(np.concatenate((coreX[:,:1], np.repeat(-(step*coefHead)[:,None],j,axis=1)),axis=1),axis=1)
+    headY=np.cumsum(np.concatenate((coreY[:,:1], -((step*coefHead)[:,None]*slopes[None,:])),axis=1),axis=1)
+    
+    #tail: points are obtained going right from the last point of the core
+    slopes=np.diff(curveTail[i-j:k+1,1])/step
+    tailX=np.cumsum(np.concatenate((coreX[:,-1:], np.repeat((step*coefHead)[:,None],k-(i-j),axis=1)),axis=1),axis=1)
+    tailY=np.cumsum(np.concatenate((coreY[:,-1:], (step*coefHead)[:,None]*slopes[None,:]),axis=1),axis=1)
+    
+    #formating and adding the head and the tail to the core
+    weightedX=np.concatenate((headX[:,:0:-1], coreX, tailX[:,1:]),axis=1)
+    weightedY=np.concatenate((headY[:,:0:-1], coreY, tailY[:,1:]),axis=1)
+    
+    return np.stack((weightedX,weightedY),axis=2)
+
+def isUniform(curveHead,curveTail,tolerance):
+    #both curves have evenly spaced points, with the same step
+    if len(curveHead) < 2 or len(curveTail) < 2:
+        return False
+    step=curveHead[1,0]-curveHead[0,0]
+    return np.allclose(np.diff(curveHead[:,0]), step, rtol=0, atol=tolerance) and np.allclose(np.diff(curveTail[:,0]), step, rtol=0, atol=tolerance)
+
+def mixCurvesNonUniform(curveHead,curveTail,coefHead,coefTail,tolerance):
+    
+    #same mixing as mixCurves, for curves whose points are not evenly spaced:
+    #the core is built on the storage deltas of both curves (each curve is linearly interpolated on the deltas of the other one)
+    mini=max(curveHead[:,0].min(), curveTail[:,0].min())
+    maxi=min(curveHead[:,0].max(), curveTail[:,0].max())
+    if mini > maxi+tolerance:
+        print('ERROR when building the core of an extrapolated cost function')
+        raise SystemExit
+    
+    x=np.sort(np.concatenate((curveHead[:,0], curveTail[:,0])))
+    x=x[(x >= mini-tolerance) & (x <= maxi+tolerance)]
+    x=x[np.concatenate(([True], np.diff(x) > tolerance))]
+    x=np.unique(np.clip(x, mini, maxi))
+    
+    coreX=np.broadcast_to(x, (len(coefHead),len(x)))
+    coreY=np.interp(x,curveHead[:,0],curveHead[:,1])[None,:]*coefHead[:,None]+np.interp(x,curveTail[:,0],curveTail[:,1])[None,:]*coefTail[:,None]
+    
+    #head and tail: original slopes are kept, the steps on the x-axis are reduced (with the same coefficient for the head and the tail)
+    headPoints=curveHead[curveHead[:,0] < mini-tolerance]
+    steps=np.diff(np.concatenate((headPoints, [[mini, np.interp(mini,curveHead[:,0],curveHead[:,1])]])),axis=0)[::-1]
+    headX=np.cumsum(np.concatenate((coreX[:,:1], -coefHead[:,None]*steps[None,:,0]),axis=1),axis=1)
+    headY=np.cumsum(np.concatenate((coreY[:,:1], -coefHead[:,None]*steps[None,:,1]),axis=1),axis=1)
+    
+    tailPoints=curveTail[curveTail[:,0] > maxi+tolerance]
+    steps=np.diff(np.concatenate(([[maxi, np.interp(maxi,curveTail[:,0],curveTail[:,1])]], tailPoints)),axis=0)
+    tailX=np.cumsum(np.concatenate((coreX[:,-1:], coefHead[:,None]*steps[None,:,0]),axis=1),axis=1)
+    tailY=np.cumsum(np.concatenate((coreY[:,-1:], coefHead[:,None]*steps[None,:,1]),axis=1),axis=1)
+    
+    weightedX=np.concatenate((headX[:,:0:-1], coreX, tailX[:,1:]),axis=1)
+    weightedY=np.concatenate((headY[:,:0:-1], coreY, tailY[:,1:]),axis=1)
+    
+    #with a coefficient of 0, the head and the tail are reduced to the ends of the core: points with the same storage delta as the previous one
+    #are removed, and the curves of these days are padded with NaN points (ignored by mixedCfPoints and toCfPoints)
+    duplicates=np.concatenate((np.zeros((len(weightedX),1),dtype=bool), np.diff(weightedX,axis=1) <= 0),axis=1)
+    if duplicates.any():
+        order=np.argsort(duplicates,axis=1,kind='stable')
+        weightedX=np.take_along_axis(np.where(duplicates,np.nan,weightedX),order,axis=1)
+        weightedY=np.take_along_axis(np.where(duplicates,np.nan,weightedY),order,axis=1)
+        nbPoints=int((~duplicates).sum(axis=1).max())
+        weightedX=weightedX[:,:nbPoints]
+        weightedY=weightedY[:,:nbPoints]
+    
+    return np.stack((weightedX,weightedY),axis=2)
@@ -1,14 +1,21 @@
 import time
 import os
+import copy
+import shutil
+import asyncio
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
 #dedicated modules
-from representativePeriods import representativePeriods
+from representativePeriods import representativePeriods, rpModelTemplate
+from cfPoints import cfPoints, mixedCfPoints, toCfPoints
 from deps.dataList import dataList
-from deps.runPerseeBatch import runPerseeBatch
+from deps.runPerseeBatch import runPerseeBatch, runPerseeAsync, readPlanValue
 
 mpl.rcParams['figure.dpi'] = 120
 plt.style.use('seaborn-whitegrid')
@@ -53,8 +60,12 @@ class costFunctions:
         except: periodSizes=[periodSizes]   
         
         configuration=dataList(nameConfig,loc)
+        configuration.buildIndex()
         timeshift=float(configuration.findParamValue('<timeshift>',ignoreComments=True))
         
+        #the data series are parsed once (time steps x data series), each set of periods is a view of this array (periods x time steps x data series)
+        dataSeries=np.ascontiguousarray(df.astype(float).to_numpy())
+        
         allNbDaysInPeriod=[]
         periodSets=[]
 
@@ -67,20 +78,9 @@ class costFunctions:
                 raise SystemExit
             else:    
                 nbPeriods=int(nbPeriods)
-                listPeriods=[]
-                for period in range(nbPeriods): 
-                    temp=[]
-                    index=period*int(nbTimeStepsForComputations/nbPeriods)
-    
-                    for k in range(int(nbTimeStepsForComputations/nbPeriods)):
-                        temp.append([])
-                        for j in range(len(df.iloc[period])):
-                            temp[k].append(float(df.iloc[k+index][j]))
-                            
-                    listPeriods.append(temp) 
-                periodSets.append(listPeriods)
+                periodSets.append(dataSeries.reshape(nbPeriods, int(nbTimeSteps/nbPeriods), dataSeries.shape[1]))
             
-            nbDaysInPeriod=int(len(listPeriods[0])/timeshift)
+            nbDaysInPeriod=int(periodSets[periodSet].shape[1]/timeshift)
             allNbDaysInPeriod.append(nbDaysInPeriod)
             
 
@@ -105,10 +105,11 @@ class costFunctions:
         self.costID=costID       
         
         #Data series splitted into periods
+        self.dataSeries=dataSeries
         self.periodSets=periodSets
         self.nbPeriods=[int(nbTimeSteps/size) for size in periodSizes]
         self.periodSizes=periodSizes
-        self.nbSeries=len(periodSets[0][0][0])
+        self.nbSeries=dataSeries.shape[1]
         self.dt=dt
         self.seriesToConsider=seriesToConsider
         
@@ -118,33 +119,120 @@ class costFunctions:
         self.allNbDaysInPeriod=allNbDaysInPeriod
         self.timeshift=timeshift
         
-    def computeRp(self, nRP=1, sRP=1, weights=[], imposedPeriods=[], imposePeak=[], gapRp=0.0001, timeLimitRp=60, threadsRp=8, nBins=40, binMethod=1):          
+    def computeRp(self, nRP=1, sRP=1, weights=[], imposedPeriods=[], imposePeak=[], gapRp=0.0001, timeLimitRp=60, threadsRp=8, nBins=40, binMethod=1, engine='numpy', store=None, modelTemplate=False, workers=1, cores=None, selector='milp', mipStart=True, screening=None, cache=None):          
         allPeriodsRp=[]
         
+        if cache is not None:
+            cacheStart=cache.stats()
+        
+        #model templates, shared by the periods with the same structure (only the coefficients of the model are updated from one period to the next)
+        templates={}
+        
+        parameters={'dt':self.dt, 'weights':weights, 'imposedPeriods':imposedPeriods, 'imposePeak':imposePeak, 'gapRp':gapRp, 'timeLimitRp':timeLimitRp, 
+                    'threadsRp':threadsRp, 'nBins':nBins, 'binMethod':binMethod, 'engine':engine, 'modelTemplate':modelTemplate, 'selector':selector, 
+                    'mipStart':mipStart, 'screening':screening}
+        
+        #representative periods to compute: [periodSet, period, nRPPeriod, sRPPeriod, key in the stage store, key in the cache]
+        #periods with the same normalised data as a period to compute are only computed once (duplicates)
+        tasks=[]
+        duplicates=[]
+        cacheKeys=set()
+        
         ##################### 2) Building representative period(s) for each period
         for periodSet in range(len(self.periodSets)):
             periodsRp=[]
             for period in range(len(self.periodSets[periodSet])):     
-                #Formating
-                data=[]
-                for j in range(len(self.periodSets[periodSet][0][0])):
-                    data.append([])
-                    for k in range( len(self.periodSets[periodSet][period])):
-                        value=self.periodSets[periodSet][period][k][j]
-                        data[j].append(value)
                 
-                print()
-                print("Computing representative period",str(period),"of periods of length",str(len(self.periodSets[periodSet][0])))
-
                 if len(self.periodSets[periodSet][0])==24: 
-                    rp=representativePeriods(data, 1, 1, self.dt, weights, imposedPeriods, imposePeak, gapRp, timeLimitRp, threadsRp, nBins, binMethod)
+                    nRPPeriod,sRPPeriod=1,1
                 else:
-                    rp=representativePeriods(data, nRP, sRP, self.dt, weights, imposedPeriods, imposePeak, gapRp, timeLimitRp, threadsRp, nBins, binMethod)
+                    nRPPeriod,sRPPeriod=nRP,sRP
+                
+                #representative periods are only computed if the data of the period or the parameters changed since they were stored
+                rp=None
+                key=None
+                if store is not None:
+                    key=store.key(['rp', self.periodSets[periodSet][period], nRPPeriod, sRPPeriod, self.dt, weights, imposedPeriods, imposePeak, gapRp, timeLimitRp, nBins, binMethod, selector, mipStart, screening])
+                    rp=store.get('rp',key)
+                    if rp is not None:
+                        print()
+                        print("Representative period",str(period),"of periods of length",str(len(self.periodSets[periodSet][0])),"read in the stage store")
+                
+                #the selection is not computed if the same problem (normalised data and selection parameters) was already solved (cache)
+                cacheKey=None
+                if rp is None and cache is not None:
+                    cacheKey=cache.key(self.periodSets[periodSet][period], nRPPeriod, sRPPeriod, self.dt, weights, imposedPeriods, imposePeak, nBins, binMethod, gapRp, selector, screening)
+                    cachedSolution=cache.get(cacheKey)
+                    if cachedSolution is not None:
+                        rp=computeRpPeriod(self.periodSets[periodSet][period], period, nRPPeriod, sRPPeriod, parameters, templates, cachedSolution)
+                        if store is not None and hasattr(rp,'solution'):
+                            store.put('rp',key,storableRp(rp))
+                
+                if rp is None:
+                    if cacheKey in cacheKeys:
+                        duplicates.append([periodSet, period, nRPPeriod, sRPPeriod, key, cacheKey])
+                    else:
+                        tasks.append([periodSet, period, nRPPeriod, sRPPeriod, key, cacheKey])
+                        if cacheKey is not None:
+                            cacheKeys.add(cacheKey)
                      
                 periodsRp.append(rp)
                 
             allPeriodsRp.append(periodsRp)
         
+        #serial computations: each solve uses 'threadsRp' threads
+        if workers <= 1 or len(tasks) <= 1:
+            for periodSet,period,nRPPeriod,sRPPeriod,key,cacheKey in tasks:
+                rp=computeRpPeriod(self.periodSets[periodSet][period], period, nRPPeriod, sRPPeriod, parameters, templates)
+                #failed solves (no solution) are neither stored nor cached
+                if store is not None and hasattr(rp,'solution'):
+                    store.put('rp',key,storableRp(rp))
+                if cache is not None and hasattr(rp,'solution'):
+                    cache.put(cacheKey,rp)
+                allPeriodsRp[periodSet][period]=rp
+        
+        #parallel computations: up to 'workers' solves at once, sharing 'cores' threads (all the cores of the machine by default)
+        #the data series are shared with the workers (shared memory), each worker reads the data of its periods from them
+        else:
+            workers=min(workers,len(tasks))
+            if cores is None:
+                cores=os.cpu_count()
+            parameters['threadsRp']=max(1,int(cores/workers))
+            print()
+            print("Computing",str(len(tasks)),"representative periods with",str(workers),"workers x",str(parameters['threadsRp']),"threads")
+            
+            sharedData=shared_memory.SharedMemory(create=True, size=self.dataSeries.nbytes)
+            try:
+                np.ndarray(self.dataSeries.shape, dtype=self.dataSeries.dtype, buffer=sharedData.buf)[:]=self.dataSeries
+                with ProcessPoolExecutor(max_workers=workers, initializer=initRpWorker, initargs=(sharedData.name,self.dataSeries.shape,self.dataSeries.dtype,parameters)) as executor:
+                    futures=[executor.submit(computeRpInWorker, len(self.periodSets[periodSet][0]), period, nRPPeriod, sRPPeriod) 
+                             for periodSet,period,nRPPeriod,sRPPeriod,key,cacheKey in tasks]
+                    #results are read in period order
+                    for task,future in zip(tasks,futures):
+                        periodSet,period,nRPPeriod,sRPPeriod,key,cacheKey=task
+                        rp=future.result()
+                        if store is not None and hasattr(rp,'solution'):
+                            store.put('rp',key,rp)
+                        if cache is not None and hasattr(rp,'solution'):
+                            cache.put(cacheKey,rp)
+                        allPeriodsRp[periodSet][period]=rp
+            finally:
+                sharedData.close()
+                sharedData.unlink()
+        
+        #duplicates: the solution of the period with the same normalised data is read in the cache
+        for periodSet,period,nRPPeriod,sRPPeriod,key,cacheKey in duplicates:
+            rp=computeRpPeriod(self.periodSets[periodSet][period], period, nRPPeriod, sRPPeriod, parameters, templates, cache.get(cacheKey))
+            if store is not None and hasattr(rp,'solution'):
+                store.put('rp',key,storableRp(rp))
+            allPeriodsRp[periodSet][period]=rp
+        
+        if store is not None:
+            print("Stage store, representative periods: ",store.stats('rp')['reused']," reused, ",store.stats('rp')['computed']," computed")
+        if cache is not None:
+            stats=cache.stats(cacheStart)
+            print("Representative periods cache: ",stats['hits']," hits, ",stats['misses']," misses, ",stats['entries']," entries")
+        
         self.allPeriodsRp=allPeriodsRp
         self.nRP=nRP
         self.sRP=sRP
@@ -183,197 +271,390 @@ class costFunctions:
         self.sizeSto=sizeSto
         self.deltas=deltas
 
-    def computeCf(self, nameBatch, gap, timeLimit, initSOC, converterID='', absInitialStateID=''):
+    def computeCf(self, nameBatch, gap, timeLimit, initSOC, converterID='', absInitialStateID='', workers=1, cache=None, appendLog=False, useAsyncio=False, runTimeout=None,
+                  adaptive=False, adaptiveTolerance=0.001, maxPointsPerPeriod=None, pruneInfeasible=False,
+                  journal=None, resume=False, store=None):
         self.cFmethod="basic"
         
-        allPeriodsFunctions=[]
-        allPeriodsFunctionsOff=[]
+        if cache is not None:
+            cacheStart=cache.stats()
+        if runTimeout is not None and not useAsyncio:
+            print("WARNING: the timeout of the Persee runs is only used with the asynchronous runner (useAsyncio=True)")
+        
+        #results of the Persee runs already done, read in the journal (the journal is emptied when starting a new computation)
+        #the runs of the journal are only replayed if it was written for the same inputs (Persee files, parameters of the runs, representative periods, storage deltas)
+        replayed={}
+        if journal is not None:
+            inputs=[nameBatch, gap, timeLimit, initSOC, self.sizeSto, converterID+absInitialStateID, self.converterState, self.seriesToConsider, self.dt]
+            dataFile=open(self.loc+self.nameData,'rb')
+            inputs.append(dataFile.read())
+            dataFile.close()
+            for periodSet in range(len(self.allPeriodsRp)):
+                for period in range(len(self.allPeriodsRp[periodSet])):
+                    rp=self.allPeriodsRp[periodSet][period]
+                    inputs+=[np.asarray(self.deltas[periodSet][period]), rp.optWeightsCompact, rp.rpList, rp.sRPh, rp.nbPdt, rp.nRP]
+                #the Persee files are written for each run and restored at the end: after a crash (process killed, reboot), the files read here are those of the last run,
+                #so the files are hashed as modified for the set of periods, without the parameters changed for each case (as in the keys of the stage store)
+                configuration=dataList(self.nameConfig,self.loc)
+                configuration.buildIndex()
+                settings,structure=self.cfPerseeFiles(periodSet, configuration, gap, timeLimit, converterID+absInitialStateID)
+                inputs+=caseNeutralContents({'settings':settings, 'configuration':configuration, 'structure':structure,
+                                             'initSocParam':self.storageID+self.initSocID, 'finalSocParam':self.storageID+self.finalSocID, 
+                                             'converterState':self.converterState, 'absInitialStateParam':converterID+absInitialStateID,
+                                             'dataLine':max(configuration.findParam(self.nameData)[0],0)})
+            inputs=journal.inputsKey(inputs)
+            if resume and journal.inputs() != inputs:
+                print("WARNING: the journal "+journal.path+" was written for other inputs, it is ignored and the computation starts over")
+                resume=False
+            if resume:
+                replayed=journal.results()
+                print("Journal: ",len(replayed)," Persee runs already done")
+            else:
+                journal.clear(inputs)
+        elif resume:
+            print("WARNING: no journal given, the computation can not be resumed")
+        
+        allPeriodsFunctions=cfPoints()
+        allPeriodsFunctionsOff=cfPoints()
+        
+        #statistics of the computation: number of storage deltas computed, cases, Persee runs and cache hits, runs skipped beyond the infeasibility frontier,
+        #cases read in the journal, time spent running Persee and in each case (summed over workers), time spent in each phase (preparation of the files, Persee runs, gathering of the results)
+        cfStats={'points':0, 'cases':0, 'runs':0, 'cached':0, 'skippedRuns':0, 'resumed':0, 'perseeTime':0., 'caseTime':0., 'workers':workers,
+                 'phases':{'preparation':0., 'runs':0., 'aggregation':0.}}
         periodSet=0
         period=0
         noRp=0
             
+        #the Persee files are restored at the end, also when the computation fails
+        originalSettings=dataList(self.nameSettings,self.loc)
+        originalStructure=dataList(self.nameDesc,self.loc)
+            
         ##################### 4) Computation of cost functions
-        for periodSet in range(len(self.allPeriodsRp)):
-            print("------------> set of periods of length:",str(len(self.periodSets[periodSet][0])))
+        try:
+            for periodSet in range(len(self.allPeriodsRp)):
+                print("------------> set of periods of length:",str(len(self.periodSets[periodSet][0])))
 
-            timeStart=time.perf_counter()
-                
-            #reading Persee data file
-            dataPersee=np.genfromtxt(self.loc+self.nameData, delimiter=';', dtype=str)
-            dataPersee[0].tolist()
-            
-            #modification of the Persee files
-            structure=dataList(self.nameDesc,self.loc)
-            settings=dataList(self.nameSettings,self.loc)
-            
-            self.configuration.changeParamValue('futursize', str(len(self.allPeriodsRp[periodSet][0].rpList[0][0]))) 
-            self.configuration.changeParamValue('pastsize', '24') 
-            self.configuration.changeParamValue('timeshift', '24') 
-            self.configuration.changeParamValue('CycleStop', '1') 
-            while self.configuration.commentParam('<TimeStepFile>'):pass
-            while self.configuration.commentParam('<ComputationFuturSize>'):pass
-            while self.configuration.commentParam('<MyTypicalPeriod>'):pass
-            while structure.commentParam('<UseProfileLoadFluxSeasonal>'):pass
-            while structure.commentParam('<UseProfileBuyPriceSeasonal>'):pass
-            while structure.commentParam('<UseGridCarbonContentSeasonal>'):pass
-            settings.changeParamValue('Cplex.Gap', gap) 
-            settings.changeParamValue('Cplex.TimeLimit', timeLimit) 
-            settings.changeParamValue(self.storageID+self.lossesID, '0.') #losses are already considered when in the MILP model using the cost functions
-            settings.changeAllParamValues("SeasonalPrevisions",'false')
-
-            costs=[]
-            costsOff=[]
-
-            if self.converterState:
-                settings.changeParamValue(converterID+absInitialStateID, '1')
-            
-            for period in range(len(self.allPeriodsRp[periodSet])):
-            
-                print("-------> period ",period)
+                timeStart=time.perf_counter()
+                timePhase=timeStart
                 
+                #reading Persee data file
+                dataPersee=np.genfromtxt(self.loc+self.nameData, delimiter=';', dtype=str)
+                dataPersee[0].tolist()
+            
+                #modification of the Persee files
+                settings,structure=self.cfPerseeFiles(periodSet, self.configuration, gap, timeLimit, converterID+absInitialStateID)
+
+                nbPeriods=len(self.allPeriodsRp[periodSet])
+                allPeriodsFunctions.addPeriodSet(nbPeriods, len(self.deltas[periodSet][0]), deltas=self.deltas[periodSet][:nbPeriods])
+                allPeriodsFunctionsOff.addPeriodSet(nbPeriods, len(self.deltas[periodSet][0]), deltas=self.deltas[periodSet][:nbPeriods])
+            
                 #writing Persee files for the cost functions computation
-                for noRp in range(self.allPeriodsRp[periodSet][period].nRP):
+                rpFiles=[]
+                for period in range(len(self.allPeriodsRp[periodSet])):
+                    rpFiles.append([])
+                    for noRp in range(self.allPeriodsRp[periodSet][period].nRP):
                     
-                    name='\\'+self.nameData+'_'+str(self.allPeriodsRp[periodSet][period].nbPdt)+'_period'+str(period)+'_rp'+str(noRp)+'.csv'
+                        name='\\'+self.nameData+'_'+str(self.allPeriodsRp[periodSet][period].nbPdt)+'_period'+str(period)+'_rp'+str(noRp)+'.csv'
                 
-                    writeRp(dataPersee,self.allPeriodsRp[periodSet][period],noRp,self.seriesToConsider,self.dt,self.loc+'//representativePeriods',name)
-                                    
-                #computation of the operational cost for each storage delta
-                originalPoints=[]
-                originalPointsOff=[]
+                        writeRp(dataPersee,self.allPeriodsRp[periodSet][period],noRp,self.seriesToConsider,self.dt,self.loc+'//representativePeriods',name)
+                        rpFiles[period].append(self.loc+'//representativePeriods'+name)
+            
+                env={'settings':settings, 'configuration':self.configuration, 'structure':structure,
+                     'nameBatch':nameBatch, 'nameData':self.nameData, 'namePLAN':self.namePLAN, 'nameFbsfLog':self.nameFbsfLog, 'costID':self.costID,
+                     'initSocParam':self.storageID+self.initSocID, 'finalSocParam':self.storageID+self.finalSocID, 
+                     'converterState':self.converterState, 'absInitialStateParam':converterID+absInitialStateID, 'cache':cache, 'appendLog':appendLog, 'runTimeout':runTimeout,
+                     'journal':journal, 'dataLine':max(self.configuration.findParam(self.nameData)[0],0)}
+            
+                #the cost function of a period depends on its representative periods (and their data files), on its storage deltas,
+                #on the Persee files as modified for the computation and on the parameters of the computation
+                #the parameters changed for each case are left out of the Persee files: their values are left by the previous cases (in memory in serial mode, on disk in the files read for the next sets of periods)
+                if store is not None:
+                    common=['points']+caseNeutralContents(env)+[nameBatch, self.costID, initSOC, self.sizeSto, 
+                            self.converterState, converterID+absInitialStateID, adaptive, adaptiveTolerance, maxPointsPerPeriod, pruneInfeasible]
+                    keys=[]
+                    for period in range(len(self.allPeriodsRp[periodSet])):
+                        rp=self.allPeriodsRp[periodSet][period]
+                        rpData=[]
+                        for rpFile in rpFiles[period]:
+                            rpFile=open(rpFile,'rb')
+                            rpData.append(rpFile.read())
+                            rpFile.close()
+                        keys.append(store.key(common+[self.deltas[periodSet][period], rp.optWeightsCompact, rp.sRPh, rp.nbPdt, rp.nRP]+rpData))
+            
+            
+                #storage deltas to compute, for each period (indices in self.deltas, in decreasing order)
+                #in adaptive mode the points are computed in successive waves: the extremes and zero first, then the intervals where the cost function is not linear enough are refined
+                #when pruning, the points are computed going outward from zero (one point per direction in each wave), so that the points beyond the infeasibility frontier are not computed
+                #otherwise all of them are computed at once
+                nbPoints=len(self.deltas[periodSet][0])
+                if adaptive:
+                    pointsToCompute=[sorted(set([nbPoints-1,nbPoints//2,0]),reverse=True) for period in range(nbPeriods)]
+                elif pruneInfeasible:
+                    pointsToCompute=[innerCfPoints(self.deltas[periodSet][period],range(nbPoints)) for period in range(nbPeriods)]
+                else:
+                    pointsToCompute=[list(range(nbPoints-1,-1,-1)) for period in range(nbPeriods)]
+                costs=[{} for period in range(nbPeriods)] #costs of the valid points of each period
+                computed=[set() for period in range(nbPeriods)]
+                skipped=[set() for period in range(nbPeriods)]
+                stopped=[set() for period in range(nbPeriods)] #points for which runs were stopped (timeout): failed, but not unfeasible
+            
+                #cost functions already stored are not computed again
+                reused=set()
+                if store is not None:
+                    for period in range(nbPeriods):
+                        stored=store.get('points',keys[period])
+                        if stored is not None:
+                            allPeriodsFunctions.points[periodSet][period],allPeriodsFunctions.valid[periodSet][period]=stored[0]
+                            allPeriodsFunctionsOff.points[periodSet][period],allPeriodsFunctionsOff.valid[periodSet][period]=stored[1]
+                            pointsToCompute[period]=[]
+                            reused.add(period)
+            
+                #the scratch folders of the workers and the pool of processes are prepared once, and used by all the waves of computations
+                workerLocs=None
+                executor=None
+                if sum([len(points) for points in pointsToCompute]) > 0 and (useAsyncio or workers > 1):
+                    workerLocs=prepareWorkerLocs(self.loc, env, max(workers,1))
+                    if not useAsyncio:
+                        executor=startCfPool(workerLocs, env)
+            
+                while sum([len(points) for points in pointsToCompute]) > 0:
+                
+                    #listing the Persee runs: one per period, storage delta to compute and representative period (same order as the results are gathered)
+                    #if the initial state of the converter is considered, both initial states are independent runs (converter ON, then OFF)
+                    cases=[]
+                    for period in range(len(self.allPeriodsRp[periodSet])):
+                        for point in pointsToCompute[period]:
+                    
+                            ratio=self.allPeriodsRp[periodSet][period].sRPh / self.allPeriodsRp[periodSet][period].nbPdt #ratio to extrapolate the cost of the original period from the cost of the representative period
+                    
+                            if self.deltas[periodSet][period][point] >= 0:
+                                initSoc=str(initSOC) #the default initial state of charge can be set positive to avoid side effects (10% by default)
+                                finalSoc=str(self.deltas[periodSet][period][point]*ratio/self.sizeSto + initSOC)
+                            else: 
+                                initSoc=str(-self.deltas[periodSet][period][point]*ratio/self.sizeSto + initSOC)
+                                finalSoc=str(initSOC)
                     
-                for point in range(len(self.deltas[periodSet][period])-1,-1,-1):
+                            for noRp in range(self.allPeriodsRp[periodSet][period].nRP):
+                                name='representativePeriods/'+self.nameData+'_'+str(self.allPeriodsRp[periodSet][period].nbPdt)+'_period'+str(period)+'_rp'+str(noRp)+'.csv'
+                                if self.converterState:
+                                    cases.append({'periodSet':periodSet, 'period':period, 'point':point, 'noRp':noRp, 'initSoc':initSoc, 'finalSoc':finalSoc, 'rpFile':name, 'state':'1'})
+                                    cases.append({'periodSet':periodSet, 'period':period, 'point':point, 'noRp':noRp, 'initSoc':initSoc, 'finalSoc':finalSoc, 'rpFile':name, 'state':'0'})
+                                else:
+                                    cases.append({'periodSet':periodSet, 'period':period, 'point':point, 'noRp':noRp, 'initSoc':initSoc, 'finalSoc':finalSoc, 'rpFile':name, 'state':None})
+            
+                    cfStats['phases']['preparation']+=time.perf_counter()-timePhase
+                    timePhase=time.perf_counter()
+            
+                    #running Persee (in parallel if several workers are used), results are given in the order of the cases
+                    #when resuming, the runs found in the journal are not launched again
+                    results=[None]*len(cases)
+                    toRun=[]
+                    for noCase in range(len(cases)):
+                        if journal is not None and journal.key(cases[noCase]) in replayed:
+                            results[noCase]=replayed[journal.key(cases[noCase])]+[{'runs':0, 'cached':0, 'perseeTime':0., 'caseTime':0.}]
+                        else:
+                            toRun.append(noCase)
+                    for noCase,result in zip(toRun,runCfCases([cases[noCase] for noCase in toRun], self.loc, env, workers, useAsyncio, workerLocs, executor)):
+                        results[noCase]=result
+                    cfStats['resumed']+=len(cases)-len(toRun)
+            
+                    cfStats['phases']['runs']+=time.perf_counter()-timePhase
+                    timePhase=time.perf_counter()
+                    cfStats['cases']+=len(cases)
+                    for result in results:
+                        for stat in ['runs','cached','perseeTime','caseTime']:
+                            cfStats[stat]+=result[2][stat]
+            
+                    #computation of the operational cost for each storage delta
+                    noCase=0
+                    for period in range(len(self.allPeriodsRp[periodSet])):
+            
+                        print("-------> period ",period)
                     
-                    ratio=self.allPeriodsRp[periodSet][period].sRPh / self.allPeriodsRp[periodSet][period].nbPdt #ratio to extrapolate the cost of the original period from the cost of the representative period
+                        for point in pointsToCompute[period]:
                     
-                    if self.deltas[periodSet][period][point] >= 0:
-                        settings.changeParamValue(self.storageID+self.initSocID, str(initSOC)) #the default initial state of charge can be set positive to avoid side effects (10% by default)
-                        settings.changeParamValue(self.storageID+self.finalSocID, str(self.deltas[periodSet][period][point]*ratio/self.sizeSto + initSOC)) 
-                    else: 
-                        settings.changeParamValue(self.storageID+self.initSocID, str(-self.deltas[periodSet][period][point]*ratio/self.sizeSto + initSOC))
-                        settings.changeParamValue(self.storageID+self.finalSocID, str(initSOC))
+                            ratio=self.allPeriodsRp[periodSet][period].sRPh / self.allPeriodsRp[periodSet][period].nbPdt #ratio to extrapolate the cost of the original period from the cost of the representative period
              
-                    #computations are done for each representative period of the current period, costs are then weighted
-                    weightedCosts=[]
-                    weightedCostsOff=[]
-                    ignoredPointWeights=[] #if one of the representative period yield an unfeasible problem, its weight is recorded to further ajust the final cost 
+                            #computations are done for each representative period of the current period, costs are then weighted
+                            weightedCosts=[]
+                            weightedCostsOff=[]
+                            ignoredPointWeights=[] #if one of the representative period yield an unfeasible problem, its weight is recorded to further ajust the final cost 
+                            stoppedRun=False #if one of the runs was stopped (timeout), the cost of the point is unknown
 
-                    for noRp in range(self.allPeriodsRp[periodSet][period].nRP):
-                        name='representativePeriods/'+self.nameData+'_'+str(self.allPeriodsRp[periodSet][period].nbPdt)+'_period'+str(period)+'_rp'+str(noRp)+'.csv'
-                        if not self.configuration.changeParamValue(self.nameData, './'+name):
-                            print('ERROR: the following parameter was not changed: '+self.nameData)
-                            raise SystemExit
-
-                        #writing Persee files
-                        settings.writeFile()
-                        self.configuration.writeFile()
-                        structure.writeFile()
-                        
-                        #running Persee
-                        timeSimulation=runPerseeBatch(self.loc,nameBatch,self.nameFbsfLog)
+                            for noRp in range(self.allPeriodsRp[periodSet][period].nRP):
+                                timeSimulation,originalCost=results[noCase][:2]
+                                noCase+=1
+                                if self.converterState:
+                                    timeSimulationOff,originalCostOff=results[noCase][:2]
+                                    noCase+=1
                     
-                        #looking for unfeasible problem
-                        if timeSimulation==-2: 
-                            ignoredPointWeights.append(self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp])
-            
-                        else: 
-                            #reading results
-                            resultsFile=dataList(self.namePLAN,self.loc)
-                            originalCost=float(resultsFile.findParamValue(self.costID,ignoreComments=False)) 
+                                #looking for stopped runs and unfeasible problem
+                                if timeSimulation==-3 or (self.converterState and timeSimulationOff==-3):
+                                    stoppedRun=True
                             
-                            cost=originalCost*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]
+                                elif timeSimulation==-2: 
+                                    ignoredPointWeights.append(self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp])
+            
+                                else: 
+                                    cost=originalCost*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]
                             
-                            #if the initial state of the converter has an important side effect on the operational cost 
-                            #both initial state cases are computed to build two cost functions (and so that the cost to change the state is accounted only once)
-                            if self.converterState:
-                               
-                                #the other starting point is computed, if the obtained cost is inferior, both results are weighted
-                                settings.changeParamValue(converterID+absInitialStateID, '0')
-                                settings.writeFile()
-                                #running Persee
-                                # print("relaunch with new initial state")
-                                timeSimulation=runPerseeBatch(self.loc,nameBatch,self.nameFbsfLog)
-                                #back to the original state
-                                settings.changeParamValue(converterID+absInitialStateID, '1')
-                                settings.writeFile()
-
-                                #ignoring unfeasible problem
-                                if timeSimulation != -2: 
-                                    resultsFile=dataList(self.namePLAN,self.loc)
-                                    originalCostOff=float(resultsFile.findParamValue(self.costID,ignoreComments=False)) 
-                                    
-                                    #results are weighted so that the cost to change the state is accounted only once
-                                    totalWeight=sum(self.allPeriodsRp[periodSet][period].optWeightsCompact)
-                                    if originalCostOff < originalCost:
-                                        cost=(originalCost + originalCostOff*(1/ratio-1))*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]/totalWeight
-                                        costOff=originalCostOff*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]
-                                    else:
-                                        cost=originalCost*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]
-                                        costOff=(originalCostOff + originalCost*(1/ratio-1))*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]/totalWeight   
+                                    #if the initial state of the converter has an important side effect on the operational cost 
+                                    #both initial state cases are computed to build two cost functions (and so that the cost to change the state is accounted only once)
+                                    if self.converterState:
+
+                                        #ignoring unfeasible problem
+                                        if timeSimulationOff != -2: 
+                                            #results are weighted so that the cost to change the state is accounted only once
+                                            totalWeight=sum(self.allPeriodsRp[periodSet][period].optWeightsCompact)
+                                            if originalCostOff < originalCost:
+                                                cost=(originalCost + originalCostOff*(1/ratio-1))*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]/totalWeight
+                                                costOff=originalCostOff*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]
+                                            else:
+                                                cost=originalCost*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]
+                                                costOff=(originalCostOff + originalCost*(1/ratio-1))*self.allPeriodsRp[periodSet][period].optWeightsCompact[noRp]/totalWeight   
                             
-                            weightedCosts.append(cost)
-                            if self.converterState:
-                                weightedCostsOff.append(costOff)
-                            #     print("representative period "+str(noRp)+" done, ON state, cost = "+str(cost)+", with weight = "+str(self.allPeriodsRp[periodSet][period].optWeightsCompact[rp]))
-                            #     print("representative period "+str(noRp)+" done, OFF state, cost = "+str(costOff)+", with weight = "+str(self.allPeriodsRp[periodSet][period].optWeightsCompact[rp]))
-                            # else:
-                            #     print("representative period "+str(noRp)+" done, cost = "+str(cost)+", with weight = "+str(self.allPeriodsRp[periodSet][period].optWeightsCompact[rp]))
-
-                    #summing weighted costs, ajustement made if some costs were ignored due to computation failures
-                    if (len(ignoredPointWeights)==0 or (len(ignoredPointWeights)>0 and len(ignoredPointWeights)<self.allPeriodsRp[periodSet][period].nRP)):
-                        coefAdjustWeights=(1/ratio)/(1/ratio - sum(ignoredPointWeights))
+                                    weightedCosts.append(cost)
+                                    if self.converterState:
+                                        weightedCostsOff.append(costOff)
+                                    #     print("representative period "+str(noRp)+" done, ON state, cost = "+str(cost)+", with weight = "+str(self.allPeriodsRp[periodSet][period].optWeightsCompact[rp]))
+                                    #     print("representative period "+str(noRp)+" done, OFF state, cost = "+str(costOff)+", with weight = "+str(self.allPeriodsRp[periodSet][period].optWeightsCompact[rp]))
+                                    # else:
+                                    #     print("representative period "+str(noRp)+" done, cost = "+str(cost)+", with weight = "+str(self.allPeriodsRp[periodSet][period].optWeightsCompact[rp]))
+
+                            #summing weighted costs, ajustement made if some costs were ignored due to computation failures
+                            if stoppedRun:
+                                print("Runs stopped (timeout) for this point, point ignored")
+                                stopped[period].add(point)
                         
-                        sumCosts=sum(weightedCosts)*coefAdjustWeights
-                        originalPoints.append([self.deltas[periodSet][period][point],sumCosts])
+                            elif (len(ignoredPointWeights)==0 or (len(ignoredPointWeights)>0 and len(ignoredPointWeights)<self.allPeriodsRp[periodSet][period].nRP)):
+                                coefAdjustWeights=(1/ratio)/(1/ratio - sum(ignoredPointWeights))
                         
-                        if self.converterState:
-                            sumCostsOff=sum(weightedCostsOff)*coefAdjustWeights
-                            originalPointsOff.append([self.deltas[periodSet][period][point],sumCostsOff])
-                            print("Storage delta = ",self.deltas[periodSet][period][point], " done, corresponding cost (converter ON) = ", str(sumCosts))
-                            print("Storage delta = ",self.deltas[periodSet][period][point], " done, corresponding cost (converter OFF) = ", str(sumCostsOff))
-                        else:
-                            print("Storage delta = ",self.deltas[periodSet][period][point], " done, corresponding cost = ", str(sumCosts))
+                                sumCosts=sum(weightedCosts)*coefAdjustWeights
+                                allPeriodsFunctions.setPoint(periodSet,period,point,self.deltas[periodSet][period][point],sumCosts)
+                                costs[period][point]=[sumCosts]
+                        
+                                if self.converterState:
+                                    sumCostsOff=sum(weightedCostsOff)*coefAdjustWeights
+                                    allPeriodsFunctionsOff.setPoint(periodSet,period,point,self.deltas[periodSet][period][point],sumCostsOff)
+                                    costs[period][point].append(sumCostsOff)
+                                    print("Storage delta = ",self.deltas[periodSet][period][point], " done, corresponding cost (converter ON) = ", str(sumCosts))
+                                    print("Storage delta = ",self.deltas[periodSet][period][point], " done, corresponding cost (converter OFF) = ", str(sumCostsOff))
+                                else:
+                                    print("Storage delta = ",self.deltas[periodSet][period][point], " done, corresponding cost = ", str(sumCosts))
+                            
+                                if journal is not None:
+                                    journal.appendPoint(periodSet,period,point,self.deltas[periodSet][period][point],*costs[period][point])
 
-                    else:
-                        print("Computations failed for this point, point ignored")
+                            else:
+                                print("Computations failed for this point, point ignored")
                     
-                    # if sumCosts==0 and sumCostsOff==0: #stopping computations if costs are null
-                    #     break
-
-                originalPoints.reverse()
-                originalPointsOff.reverse()
-                costs.append(originalPoints)
-                costsOff.append(originalPointsOff)
+                            # if sumCosts==0 and sumCostsOff==0: #stopping computations if costs are null
+                            #     break
+                
+                    for period in range(nbPeriods):
+                        if period in reused:
+                            continue
+                        computed[period].update(pointsToCompute[period])
+                        if adaptive:
+                            points=refineCfPoints(self.deltas[periodSet][period],costs[period],computed[period]|skipped[period],adaptiveTolerance,maxPointsPerPeriod)
+                        elif pruneInfeasible:
+                            points=[point for point in range(nbPoints) if point not in computed[period] and point not in skipped[period]]
+                        else:
+                            points=[]
+                    
+                        #points beyond a storage delta for which all the representative periods are unfeasible (in the same direction) are skipped
+                        if pruneInfeasible:
+                            points,pruned=pruneCfPoints(self.deltas[periodSet][period],points,computed[period]-set(costs[period])-stopped[period])
+                            for point in pruned:
+                                allPeriodsFunctions.ignorePoint(periodSet,period,point)
+                                allPeriodsFunctionsOff.ignorePoint(periodSet,period,point)
+                                print("Storage delta = ",self.deltas[periodSet][period][point], " skipped (beyond the infeasibility frontier), point ignored")
+                            skipped[period].update(pruned)
+                            cfStats['skippedRuns']+=len(pruned)*self.allPeriodsRp[periodSet][period].nRP*(2 if self.converterState else 1)
+                            if not adaptive:
+                                points=innerCfPoints(self.deltas[periodSet][period],points)
+                    
+                        pointsToCompute[period]=points
+                
+                    cfStats['phases']['aggregation']+=time.perf_counter()-timePhase
+                    timePhase=time.perf_counter()
             
-            allPeriodsFunctions.append(costs)        
-            allPeriodsFunctionsOff.append(costsOff)    
-
-        #restoring Persee files     
-        settings.reinitData()
-        settings.writeFile()
-        structure.reinitData()
-        structure.writeFile()
-        self.configuration.reinitData()
-        self.configuration.writeFile()
+                if executor is not None:
+                    executor.shutdown()
+            
+                cfStats['points']+=sum([len(points) for points in computed])
+                if adaptive:
+                    print("Adaptive refinement: ",sum([len(points) for points in computed])," storage deltas computed out of ",nbPoints*nbPeriods)
+                if pruneInfeasible:
+                    print("Infeasibility frontier: ",sum([len(points) for points in skipped])," storage deltas skipped")
+                if store is not None:
+                    #the cost function of a period is not stored if none of its points is valid, or if runs were stopped (timeout)
+                    for period in range(nbPeriods):
+                        if period not in reused and allPeriodsFunctions.valid[periodSet][period].any() and len(stopped[period]) == 0:
+                            store.put('points',keys[period],[[allPeriodsFunctions.points[periodSet][period],allPeriodsFunctions.valid[periodSet][period]],
+                                                              [allPeriodsFunctionsOff.points[periodSet][period],allPeriodsFunctionsOff.valid[periodSet][period]]])
+                    print("Stage store, cost functions: ",len(reused)," periods reused, ",nbPeriods-len(reused)," computed")
+        finally:
+            #restoring Persee files
+            originalSettings.writeFile(force=True)
+            originalStructure.writeFile(force=True)
+            self.configuration.reinitData()
+            self.configuration.writeFile()
 
         self.allPeriodsFunctions=allPeriodsFunctions
         self.allPeriodsFunctionsOff=allPeriodsFunctionsOff
+        self.cfStats=cfStats
         
         timeTot=time.perf_counter() - timeStart
         print("Total computation time: ",timeTot," seconds")
         
-    def extrapolateCf(self,absTolerance=5):
+        if cache is not None:
+            stats=cache.stats(cacheStart)
+            print("Persee cache: ",stats['hits']," hits, ",stats['misses']," misses, ",stats['entries']," entries")
+        
+    def cfPerseeFiles(self, periodSet, configuration, gap, timeLimit, absInitialStateParam):
+        #reads the settings and desc files and modifies them, and the configuration, for the cost functions computation of a set of periods
+        #the parameters changed for each case (setCfCase) are not modified here
+        structure=dataList(self.nameDesc,self.loc)
+        settings=dataList(self.nameSettings,self.loc)
+        structure.buildIndex()
+        settings.buildIndex()
+        
+        configuration.changeParamValue('futursize', str(len(self.allPeriodsRp[periodSet][0].rpList[0][0]))) 
+        configuration.changeParamValue('pastsize', '24') 
+        configuration.changeParamValue('timeshift', '24') 
+        configuration.changeParamValue('CycleStop', '1') 
+        configuration.commentAllParams('<TimeStepFile>')
+        configuration.commentAllParams('<ComputationFuturSize>')
+        configuration.commentAllParams('<MyTypicalPeriod>')
+        structure.commentAllParams('<UseProfileLoadFluxSeasonal>')
+        structure.commentAllParams('<UseProfileBuyPriceSeasonal>')
+        structure.commentAllParams('<UseGridCarbonContentSeasonal>')
+        settings.changeParamValue('Cplex.Gap', gap) 
+        settings.changeParamValue('Cplex.TimeLimit', timeLimit) 
+        settings.changeParamValue(self.storageID+self.lossesID, '0.') #losses are already considered when in the MILP model using the cost functions
+        settings.changeAllParamValues("SeasonalPrevisions",'false')
+
+        if self.converterState:
+            settings.changeParamValue(absInitialStateParam, '1')
+        
+        return [settings,structure]
+        
+    def extrapolateCf(self,absTolerance=5,store=None):
         timeStart=time.perf_counter()
         
-        output=extrapolateCfOneConverterState(self.allPeriodsFunctions,self.periodSets,self.timeshift,absTolerance=absTolerance)
+        output=extrapolateCfOneConverterState(self.allPeriodsFunctions,self.periodSets,self.timeshift,absTolerance=absTolerance,store=store)
 
         self.allPeriodsWeightedFunctions=output[0]
         self.allNbDaysInPeriod=output[1]
         
         if self.converterState:
-            output=extrapolateCfOneConverterState(self.allPeriodsFunctionsOff,self.periodSets,self.timeshift,absTolerance=absTolerance)
+            output=extrapolateCfOneConverterState(self.allPeriodsFunctionsOff,self.periodSets,self.timeshift,absTolerance=absTolerance,store=store)
                 
             self.allPeriodsWeightedFunctionsOff=output[0]
+        
+        if store is not None:
+            print("Stage store, mixed curves: ",store.stats('mixed')['reused']," reused, ",store.stats('mixed')['computed']," computed")
                  
         timeTot=time.perf_counter() - timeStart
         print("Costs extrapolation, total computation time: ",timeTot," seconds")
@@ -424,36 +705,50 @@ class costFunctions:
             output=readCfOneConverterState(self.nbPeriods,self.periodSizes,self.loc,ref+'\\')
             self.allPeriodsFunctions=output[0]
             # self.allPeriodsWeightedFunctions=output[1]
+
+    def readCfJournal(self, journal):
+        #cost functions from the points recorded in the journal of a computation (possibly interrupted), the missing points are ignored
+        points=journal.points()
+        self.allPeriodsFunctions=cfPoints()
+        self.allPeriodsFunctionsOff=cfPoints()
+        for periodSet in range(len(self.nbPeriods)):
+            records=[points[key] for key in sorted(points) if key[0] == periodSet]
+            nbPoints=max([record['point'] for record in records]+[-1])+1
+            self.allPeriodsFunctions.addPeriodSet(self.nbPeriods[periodSet],nbPoints)
+            self.allPeriodsFunctionsOff.addPeriodSet(self.nbPeriods[periodSet],nbPoints)
+            for record in records:
+                self.allPeriodsFunctions.setPoint(periodSet,record['period'],record['point'],record['delta'],record['cost'])
+                if record['costOff'] is not None:
+                    self.allPeriodsFunctionsOff.setPoint(periodSet,record['period'],record['point'],record['delta'],record['costOff'])
+        print("Journal: ",len(points)," storage deltas read")
                    
         
     def showCf(self, periodSet=0, period=0, absTimeStep=-1, converterState='on'):
         def scatter(pt,label=''):
-            pt=pt.T
-            pt=pt.tolist()
-            plt.scatter(pt[0],pt[1],label=label)
+            plt.scatter(pt[:,0],pt[:,1],label=label)
             
         if absTimeStep>0:
             if converterState=='on':
-                pt=np.array(self.allPeriodsWeightedFunctions[periodSet][period][absTimeStep])
+                pt=self.allPeriodsWeightedFunctions.get(periodSet,period,absTimeStep)
                 scatter(pt) 
                 plt.title('Extrapolated cost function (set of periods of length '+str(len(self.periodSets[periodSet][0]))+'), period '+str(period)+' with absolute time step = '+str(absTimeStep))
             elif converterState=='off':
-                pt=np.array(self.allPeriodsWeightedFunctionsOff[periodSet][period][absTimeStep])
+                pt=self.allPeriodsWeightedFunctionsOff.get(periodSet,period,absTimeStep)
                 scatter(pt)
                 plt.title('Extrapolated cost function (set of periods of length '+str(len(self.periodSets[periodSet][0]))+'), period '+str(period)+' with absolute time step = '+str(absTimeStep))
 
         else:
             if converterState=='on':
-                pt=np.array(self.allPeriodsFunctions[periodSet][period])
+                pt=self.allPeriodsFunctions.get(periodSet,period)
                 scatter(pt) 
                 plt.title('Original cost function (set of periods of length '+str(len(self.periodSets[periodSet][0]))+'), period '+str(period))
             elif converterState=='off':
-                pt=np.array(self.allPeriodsFunctionsOff[periodSet][period])
+                pt=self.allPeriodsFunctionsOff.get(periodSet,period)
                 scatter(pt) 
                 plt.title('Original cost function (set of periods of length '+str(len(self.periodSets[periodSet][0]))+'), period '+str(period))
             elif converterState=='both':
-                pt=np.array(self.allPeriodsFunctions[periodSet][period])
-                ptOff=np.array(self.allPeriodsFunctionsOff[periodSet][period])
+                pt=self.allPeriodsFunctions.get(periodSet,period)
+                ptOff=self.allPeriodsFunctionsOff.get(periodSet,period)
                 scatter(pt,label="ON")
                 scatter(ptOff,label="OFF")
                 plt.title('Original cost function (set of periods of length '+str(len(self.periodSets[periodSet][0]))+'), period '+str(period))
@@ -487,197 +782,373 @@ def writeRp(dataPersee, Rp, noRp, seriesToConsider, dt, locDataPersee, name):
     
     df.to_csv(path_or_buf=locDataPersee+name,sep=';',decimal='.',header=False, index=False)   
     
-def extrapolateCfOneConverterState(allPeriodsFunctions,periodSets,timeshift,absTolerance=5):
+def computeRpPeriod(periodData, period, nRPPeriod, sRPPeriod, parameters, templates, cachedSolution=None):
+    
+    #Formating: one list per data series
+    data=periodData.T.tolist()
+    
+    print()
+    print("Computing representative period",str(period),"of periods of length",str(len(periodData)))
+    
+    template=None
+    if parameters['modelTemplate'] and parameters['selector'] != 'heuristic' and cachedSolution is None:
+        structure=(len(data[0]), len(data), nRPPeriod, sRPPeriod, parameters['dt'], parameters['nBins'])
+        if structure not in templates:
+            templates[structure]=rpModelTemplate(*structure, parameters['weights'], parameters['gapRp'], parameters['timeLimitRp'], parameters['threadsRp'])
+        template=templates[structure]
+        
+    return representativePeriods(data, nRPPeriod, sRPPeriod, parameters['dt'], parameters['weights'], parameters['imposedPeriods'], parameters['imposePeak'], 
+                                 parameters['gapRp'], parameters['timeLimitRp'], parameters['threadsRp'], parameters['nBins'], parameters['binMethod'], 
+                                 engine=parameters['engine'], template=template, selector=parameters['selector'], 
+                                 mipStart=parameters['mipStart'], screening=parameters['screening'], cachedSolution=cachedSolution)
+
+#state of the current worker process computing representative periods: the shared data series, the parameters and the model templates
+rpWorkerState={}
+
+def initRpWorker(name, shape, dtype, parameters):
+    rpWorkerState['sharedData']=shared_memory.SharedMemory(name=name)
+    rpWorkerState['dataSeries']=np.ndarray(shape, dtype=dtype, buffer=rpWorkerState['sharedData'].buf)
+    rpWorkerState['parameters']=parameters
+    rpWorkerState['templates']={}
+
+def computeRpInWorker(periodSize, period, nRPPeriod, sRPPeriod):
+    #the model can not be sent back to the main process
+    dataSeries=rpWorkerState['dataSeries']
+    periodData=dataSeries[period*periodSize:(period+1)*periodSize]
+    rp=computeRpPeriod(periodData, period, nRPPeriod, sRPPeriod, rpWorkerState['parameters'], rpWorkerState['templates'])
+    return storableRp(rp)
+
+def storableRp(rp):
+    #copy of the representative periods without the optimisation model (which can not be stored)
+    stored=copy.copy(rp)
+    stored.mdl=None
+    return stored
+
+def runCfCase(loc, env, case):
+    
+    timeCase=time.perf_counter()
+    stats={'runs':0, 'cached':0, 'perseeTime':0., 'caseTime':0.}
+    
+    #modification of the Persee files for the current case
+    setCfCase(env, case)
+    
+    #running Persee
+    timeSimulation,originalCost=runCfPersee(loc, env, case, stats)
+    
+    stats['caseTime']=time.perf_counter()-timeCase
+    return [timeSimulation,originalCost,stats]
+
+async def runCfCaseAsync(loc, env, case):
+    
+    #same as runCfCase, with the asynchronous Persee runner
+    timeCase=time.perf_counter()
+    stats={'runs':0, 'cached':0, 'perseeTime':0., 'caseTime':0.}
+    
+    setCfCase(env, case)
+    
+    timeSimulation,originalCost=await runCfPerseeAsync(loc, env, case, stats)
+    
+    stats['caseTime']=time.perf_counter()-timeCase
+    return [timeSimulation,originalCost,stats]
+
+def caseNeutralContents(env):
+    #contents of the Persee files without the lines of the parameters changed by setCfCase
+    settingsLines=[env['settings'].findParam(env['initSocParam'], warning=False)[0], env['settings'].findParam(env['finalSocParam'], warning=False)[0]]
+    if env['converterState']:
+        settingsLines.append(env['settings'].findParam(env['absInitialStateParam'], warning=False)[0])
+    contents=[]
+    for data,lines in [[env['settings'],settingsLines], [env['configuration'],[env['dataLine']]], [env['structure'],[]]]:
+        contents.append("\n".join([data.data[i] for i in range(len(data.data)) if i not in lines]))
+    return contents
+
+def setCfCase(env, case):
+    env['settings'].changeParamValue(env['initSocParam'], case['initSoc'])
+    env['settings'].changeParamValue(env['finalSocParam'], case['finalSoc'])
+    if case['state'] is not None:
+        env['settings'].changeParamValue(env['absInitialStateParam'], case['state'])
+    if not env['configuration'].changeParamValue(env['nameData'], './'+case['rpFile'], env['dataLine']):
+        print('ERROR: the following parameter was not changed: '+env['nameData'])
+        raise SystemExit
+
+def runCfPersee(loc, env, case, stats):
+    
+    key,result=prepareCfPersee(loc, env, case, stats)
+    if result is not None:
+        return result
+    
+    #running Persee
+    timePersee=time.perf_counter()
+    timeSimulation=runPerseeBatch(loc,env['nameBatch'],env['nameFbsfLog'],env['appendLog'])
+    stats['perseeTime']+=time.perf_counter()-timePersee
+    stats['runs']+=1
+    
+    return finishCfPersee(loc, env, key, timeSimulation)
+
+async def runCfPerseeAsync(loc, env, case, stats):
+    
+    key,result=prepareCfPersee(loc, env, case, stats)
+    if result is not None:
+        return result
+    
+    #running Persee (stopped after the timeout, if any)
+    timePersee=time.perf_counter()
+    timeSimulation=await runPerseeAsync(loc,env['nameBatch'],env['nameFbsfLog'],env['runTimeout'],None,env['appendLog'])
+    stats['perseeTime']+=time.perf_counter()-timePersee
+    stats['runs']+=1
+    
+    return finishCfPersee(loc, env, key, timeSimulation)
+
+def prepareCfPersee(loc, env, case, stats):
+    
+    #looking for an identical run in the cache
+    key=None
+    cache=env['cache']
+    if cache is not None:
+        rpFile=open(loc+case['rpFile'],'rb')
+        rpData=rpFile.read()
+        rpFile.close()
+        key=cache.key([env['settings'].content(), env['configuration'].content(), env['structure'].content(), 
+                       rpData, env['nameBatch'], env['costID']])
+        result=cache.get(key)
+        if result is not None:
+            stats['cached']+=1
+            return [key,result]
+    
+    #writing Persee files (only the files that changed since the previous run are written)
+    env['settings'].writeFile(loc=loc)
+    env['configuration'].writeFile(loc=loc)
+    env['structure'].writeFile(loc=loc)
+    
+    return [key,None]
+
+def finishCfPersee(loc, env, key, timeSimulation):
+    
+    #reading results (unfeasible problems and stopped runs are ignored), the PLAN file is only read up to the cost
+    #a stopped run (timeout) says nothing about the problem, it is not cached
+    originalCost=None
+    if timeSimulation not in [-2,-3]:
+        originalCost=float(readPlanValue(loc,env['namePLAN'],env['costID'])) 
+        
+    if env['cache'] is not None and timeSimulation != -3:
+        env['cache'].put(key, timeSimulation, originalCost)
+    
+    return [timeSimulation,originalCost]
+
+def runCfCases(cases, loc, env, workers=1, useAsyncio=False, workerLocs=None, executor=None):
+    
+    #the scratch folders of the workers (workerLocs) and the pool of processes (executor) can be prepared once for several calls,
+    #they are prepared for this call otherwise
+    
+    #asynchronous computations: up to 'workers' Persee runs in flight from this process
+    #when an event loop is already running in this thread (Spyder, Jupyter), asyncio.run can not be used: the runs get a loop of their own in an other thread
+    if useAsyncio:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(runCfCasesAsync(cases, loc, env, workers, workerLocs))
+        with ThreadPoolExecutor(max_workers=1) as thread:
+            return thread.submit(asyncio.run, runCfCasesAsync(cases, loc, env, workers, workerLocs)).result()
+    
+    if len(cases) == 0:
+        return []
+    
+    #serial computations, directly in the Persee folder
+    if workers <= 1:
+        results=[]
+        for case in cases:
+            results.append(runCfCase(loc, env, case))
+            journalCfCase(env, case, results[-1])
+        return results
+    
+    #parallel computations, each worker runs Persee in its own scratch folder
+    ownExecutor=executor is None
+    if ownExecutor:
+        if workerLocs is None:
+            workerLocs=prepareWorkerLocs(loc, env, workers)
+        executor=startCfPool(workerLocs, env)
+        
+    #results are written in the journal by this process, as soon as each case is done
+    try:
+        futures=[executor.submit(runCfCaseInWorker, case) for case in cases]
+        futureCases=dict(zip(futures,cases))
+        for future in as_completed(futures):
+            journalCfCase(env, futureCases[future], future.result())
+        results=[future.result() for future in futures]
+    finally:
+        if ownExecutor:
+            executor.shutdown()
+    
+    return results
+
+def startCfPool(workerLocs, env):
+    #one process per scratch folder, each process takes one folder when it starts
+    queue=mp.Queue()
+    for workerLoc in workerLocs:
+        queue.put(workerLoc)
+    return ProcessPoolExecutor(max_workers=len(workerLocs), initializer=initCfWorker, initargs=(queue,env))
+
+def journalCfCase(env, case, result):
+    #stopped runs (timeout) are not journaled, they are run again when resuming
+    if env['journal'] is not None and result[0] != -3:
+        env['journal'].appendCase(case, result)
+
+async def runCfCasesAsync(cases, loc, env, workers=1, workerLocs=None):
+    
+    #each run in flight uses its own scratch folder and its own copy of the Persee files (a free slot is waited for before each case)
+    if workerLocs is None:
+        workerLocs=prepareWorkerLocs(loc, env, max(workers,1))
+    slots=asyncio.Queue()
+    for workerLoc in workerLocs:
+        slots.put_nowait([workerLoc,copy.deepcopy(env)])
+    
+    async def runCaseInSlot(case):
+        slot=await slots.get()
+        try:
+            result=await runCfCaseAsync(slot[0], slot[1], case)
+            journalCfCase(env, case, result)
+            return result
+        finally:
+            slots.put_nowait(slot)
+    
+    return list(await asyncio.gather(*[runCaseInSlot(case) for case in cases]))
+
+def prepareWorkerLocs(loc, env, workers):
+    
+    #one scratch copy of the batch file and of the representative periods inputs per worker 
+    #(config, settings and desc files are written by the worker itself, as well as Persee outputs)
+    workerLocs=[]
+    for worker in range(workers):
+        workerLoc=loc+'workers\\worker'+str(worker)+'\\'
+        if not os.path.isdir(workerLoc):
+            os.makedirs(workerLoc)
+        shutil.copy(loc+env['nameBatch'], workerLoc+env['nameBatch'])
+        shutil.copytree(loc+'representativePeriods', workerLoc+'representativePeriods', dirs_exist_ok=True)
+        workerLocs.append(workerLoc)
+        
+    return workerLocs
+
+#state of the current worker process: its scratch folder and its own copy of the Persee files
+workerState={}
+
+def initCfWorker(queue, env):
+    workerState['loc']=queue.get()
+    workerState['env']=env
+
+def runCfCaseInWorker(case):
+    return runCfCase(workerState['loc'], workerState['env'], case)
+
+def refineCfPoints(deltas, costs, computed, tolerance=0.001, maxPoints=None):
+    #adaptive refinement of a cost function: indices of the next storage deltas to compute, in decreasing order (empty when the tolerance or the budget is met)
+    #the intervals around a point are bisected if its distance to the chord of its neighbours is above 'tolerance' times the largest cost (worst converter state)
+    #the infeasibility frontier is located first (bisection between the outermost computed and valid points), at most 'maxPoints' points, largest errors first
+    valid=sorted(costs)
+    if len(valid) == 0:
+        return []
+
+    candidates={}
+    outer=[[min([point for point in computed if point > valid[-1]], default=valid[-1]),valid[-1]],[max([point for point in computed if point < valid[0]], default=valid[0]),valid[0]]]
+    for start,end in outer:
+        uncomputed=[point for point in range(min(start,end)+1,max(start,end)) if point not in computed]
+        if len(uncomputed) > 0:
+            point=min(uncomputed, key=lambda point: abs(2*point-start-end))
+            candidates[point]=float('inf')
+
+    scale=max([abs(cost) for point in valid for cost in costs[point]])
+    for n in range(1,len(valid)-1):
+        if scale == 0:
+            break
+        left,middle,right=valid[n-1],valid[n],valid[n+1]
+        weight=(deltas[middle]-deltas[left])/(deltas[right]-deltas[left])
+        error=max([abs(costs[left][state]+weight*(costs[right][state]-costs[left][state])-costs[middle][state]) for state in range(len(costs[middle]))])
+        if error <= tolerance*scale:
+            continue
+        for start,end in [[left,middle],[middle,right]]:
+            uncomputed=[point for point in range(start+1,end) if point not in computed]
+            if len(uncomputed) > 0:
+                point=min(uncomputed, key=lambda point: abs(2*point-start-end))
+                candidates[point]=max(candidates.get(point,0),error)
+
+    points=sorted(candidates, key=lambda point: candidates[point], reverse=True)
+    if maxPoints is not None:
+        points=points[:max(maxPoints-len(computed),0)]
+    return sorted(points, reverse=True)
+
+def pruneCfPoints(deltas, points, unfeasible):
+    #splits the points (indices in 'deltas') between the points to compute and the points beyond the infeasibility frontier:
+    #feasibility is assumed monotone in the storage delta, in each direction (charge or discharge)
+    #only unfeasible points are given, not the points whose runs failed for an other reason (stopped runs)
+    kept=[]
+    pruned=[]
+    for point in points:
+        if any([deltas[point]*deltas[fail] > 0 and abs(deltas[fail]) <= abs(deltas[point]) for fail in unfeasible]):
+            pruned.append(point)
+        else:
+            kept.append(point)
+    return [kept,pruned]
+
+def innerCfPoints(deltas, points):
+    #zero and the innermost point of each direction, in decreasing order
+    inner=[point for point in points if deltas[point] == 0]
+    for direction in [1,-1]:
+        side=[point for point in points if deltas[point]*direction > 0]
+        if len(side) > 0:
+            inner.append(min(side, key=lambda point: abs(deltas[point])))
+    return sorted(inner, reverse=True)
+
+def extrapolateCfOneConverterState(allPeriodsFunctions,periodSets,timeshift,absTolerance=5,store=None):
 
     ##################### 5) extrapolation of the cost fonctions for each weighted combination of two periods: building the 'mixed curves'
     
-    allPeriodsWeightedFunctions=[]
+    allPeriodsFunctions=toCfPoints(allPeriodsFunctions)
+    allPeriodsWeightedFunctions=mixedCfPoints(absTolerance)
     allNbDaysInPeriod=[]
 		
-    for periodSet in range(len(allPeriodsFunctions)):
-        allWeightedFunctions=[]
+    for periodSet in range(allPeriodsFunctions.nbPeriodSets()):
         nbDaysInPeriod=int(len(periodSets[periodSet][0])/timeshift)
         allNbDaysInPeriod.append(nbDaysInPeriod)
+        allPeriodsWeightedFunctions.addPeriodSet(nbDaysInPeriod)
 
-        for period in range(len(allPeriodsFunctions[periodSet])):
-            #building weighted functions
-            weightedFunctions=[]
-            for h in range(nbDaysInPeriod):
-                weightedFunctions.append([])
-
+        for period in range(allPeriodsFunctions.nbPeriods(periodSet)):
             #the weighting if done between the current period and the next one
             nextPeriod=period+1
-            if period+1 >= len(allPeriodsFunctions[periodSet]):
+            if period+1 >= allPeriodsFunctions.nbPeriods(periodSet):
                 nextPeriod=0
             
+            #the mixed curves of a period depend on the cost functions of the period and of the next one
+            if store is not None:
+                key=store.key(['mixed', allPeriodsFunctions.get(periodSet,period), allPeriodsFunctions.get(periodSet,nextPeriod), nbDaysInPeriod, absTolerance])
+                stored=store.get('mixed',key)
+                if stored is not None:
+                    allPeriodsWeightedFunctions.addPeriod(periodSet,stored[0],stored[1],stored[2],check=False)
+                    print('cost function extrapolations, period '+str(period)+' read in the stage store')
+                    continue
+            
             #defining the lower and the upper function (it is assumed that function curves do not cross)
             sumCostsCurrentPeriod=0
-            for point in range(len(allPeriodsFunctions[periodSet][period])):
-                sumCostsCurrentPeriod+=allPeriodsFunctions[periodSet][period][point][1]
+            for cost in allPeriodsFunctions.get(periodSet,period)[:,1].tolist():
+                sumCostsCurrentPeriod+=cost
             sumCostsNextPeriod=0
-            for point in range(len(allPeriodsFunctions[periodSet][nextPeriod])):
-                sumCostsNextPeriod+=allPeriodsFunctions[periodSet][nextPeriod][point][1]
+            for cost in allPeriodsFunctions.get(periodSet,nextPeriod)[:,1].tolist():
+                sumCostsNextPeriod+=cost
             
             if sumCostsCurrentPeriod > sumCostsNextPeriod:
-                curveUp=np.array(allPeriodsFunctions[periodSet][period])
-                curveDown=np.array(allPeriodsFunctions[periodSet][nextPeriod])
+                curveUp=allPeriodsFunctions.get(periodSet,period)
+                curveDown=allPeriodsFunctions.get(periodSet,nextPeriod)
                 currentUp=True
             else:              
-                curveUp=np.array(allPeriodsFunctions[periodSet][nextPeriod])
-                curveDown=np.array(allPeriodsFunctions[periodSet][period])
+                curveUp=allPeriodsFunctions.get(periodSet,nextPeriod)
+                curveDown=allPeriodsFunctions.get(periodSet,period)
                 currentUp=False
-                
-            #formating
-            curveUp=curveUp.T
-            curveUp=curveUp.tolist()
-            curveDown=curveDown.T
-            curveDown=curveDown.tolist()
-                        
-            #if one curve if longer than the other on the left, this part is called the 'head', the rest is called the 'core'
-            #similarly, if one curve if longer than the other on the right, this part is called the 'tail'
-            head=False
-            if abs(curveUp[0][0]) > abs(curveDown[0][0]):
-                curveHead=curveUp
-                curveTail=curveDown
-                head=True
-            elif abs(curveUp[0][0]) < abs(curveDown[0][0]):
-                curveHead=curveDown
-                curveTail=curveUp
-                head=True
-            else: 
-                curveHead=curveUp
-                curveTail=curveDown
-            
-            j=0
-            if (head):
-                head=[[],[]]
-                while curveTail[0][0] != curveHead[0][j] and j < len(curveHead[0]):
-                    head[0].append(curveHead[0][j])
-                    head[1].append(curveHead[1][j])
-                    j+=1
-                    if j == len(curveHead[0])-1: 
-                        print('ERROR when building the head of a cost function')
-                        raise SystemExit
-                    #now, j is the first point of the curve with a head that is in the core
-                
-            #building the core of each curve
-            mini=max(min(curveHead[0]), min(curveTail[0])) #minimum value excluding the head
-            maxi=min(max(curveHead[0]), max(curveTail[0])) #maximum value excluding the tail
-            
-            step=curveHead[0][1]-curveHead[0][0]
-				
-            nbCorePoints=int(round((maxi-mini)/step,absTolerance))+1
-    
-            for i in range (j, j+nbCorePoints):
-                #numerical approximations can lead to two points with strictly different x values but that can be considered as equal: hence a tolerance is considered 
-                if round(curveHead[0][i],absTolerance) == round(curveTail[0][i-j],absTolerance): 
-                    for h in range(nbDaysInPeriod):
-                        #definition of the coefficient between the two functions
-                        if currentUp:
-                            coefHead=1-h/nbDaysInPeriod
-                            coefTail=h/nbDaysInPeriod
-                        else:
-                            coefHead=h/nbDaysInPeriod
-                            coefTail=1-h/nbDaysInPeriod
-                            
-                        balance=curveHead[1][i]*coefHead+curveTail[1][i-j]*coefTail
-                        weightedFunctions[h].append([curveHead[0][i],balance])
-                       
-                else:
-                    print('ERROR when building the core of an extrapolated cost function')
-                    raise SystemExit
-                #now, i is the last point of the curve with a head that is in the core
-    
-            #if one curve if longer than the other on the left, this part is called the 'head', the rest is called the 'core'
-            #similarly, if one curve if longer than the other on the right, this part is called the 'tail'
-            tail=False
-            if abs(curveTail[0][len(curveTail[0])-1]) > abs(curveHead[0][len(curveHead[0])-1]):
-                tail=True  
-            if (tail):
-                tail=[[],[]]
-                for k in range (i-j+1, len(curveTail[0])):
-                    tail[0].append(curveTail[0][k])
-                    tail[1].append(curveTail[1][k])
-                   
-            else: k=len(curveTail[0])-1 #correcting the value of k if there is no tail
-            #now, k is the last point of the curve with a tail
-    
-            #building the edges of each curve (the head and the tail)
-            #j=first point of the curve with the head that is in the core
-            #i=last point of the curve with the head
-            #k=last point of curve with the tail
-            
-            #original slopes are kept, the step on the x-axis is reduced
-            
-            #head   
-            slopes=[] #defining the slopes of the head
-           
-            for l in range(j):
-                slope=(curveHead[1][l+1]-curveHead[1][l])/step
-                slopes.append(slope)
-            slopes.reverse()
-            
-            #adding the point for each curve
-            for h in range(nbDaysInPeriod):     
-                currentHead=[[weightedFunctions[h][0][0]],[weightedFunctions[h][0][1]]]
-                  
-                #coefficient definition
-                if currentUp:
-                    coefHead=1-h/nbDaysInPeriod
-                    coefTail=h/nbDaysInPeriod
-                else:
-                    coefHead=h/nbDaysInPeriod
-                    coefTail=1-h/nbDaysInPeriod
-                for l in range(j):
-                    currentHead[0].append(currentHead[0][l]-step*coefHead)
-                    currentHead[1].append(currentHead[1][l]-step*coefHead*slopes[l]) 
-                
-                #formating and adding the head to the core
-                del currentHead[0][0]
-                del currentHead[1][0]
-                currentHead[0].reverse()
-                currentHead[1].reverse()
-                currentHead=np.array(currentHead)
-                currentHead=currentHead.T
-                currentHead=currentHead.tolist()
-                weightedFunctions[h]=currentHead+weightedFunctions[h]    
-                                                    
-            #tail
-            slopes=[] #defining the slopes of the tail
-                            
-            for l in range (i-j,k):
-                slope=(curveTail[1][l+1]-curveTail[1][l])/step
-                slopes.append(slope)
-                
-            #adding the point for each curve
-            for h in range(nbDaysInPeriod):                   
-                currentTail=[[weightedFunctions[h][len(weightedFunctions[h])-1][0]],[weightedFunctions[h][len(weightedFunctions[h])-1][1]]]
-
-                #coefficient definition
-                if currentUp:
-                    coefHead=h/nbDaysInPeriod
-                    coefTail=1-h/nbDaysInPeriod
-                else:
-                    coefHead=1-h/nbDaysInPeriod
-                    coefTail=h/nbDaysInPeriod
-                for l in range(k-(i-j)):
-                    currentTail[0].append(currentTail[0][l]+step*coefTail)
-                    currentTail[1].append(currentTail[1][l]+step*coefTail*slopes[l]) 
-
-                #formating and adding the tail to the core
-                del currentTail[0][0]
-                del currentTail[1][0]
-                currentTail=np.array(currentTail)
-                currentTail=currentTail.T
-                currentTail=currentTail.tolist()
-                weightedFunctions[h]=weightedFunctions[h]+currentTail 
-                                
-            allWeightedFunctions.append(weightedFunctions)
-
-            print('cost function extrapolations, period '+str(period)+' done')
             
-        allPeriodsWeightedFunctions.append(allWeightedFunctions)
-        
+            #only the two curves are kept, mixed curves are built when needed
+            allPeriodsWeightedFunctions.addPeriod(periodSet,curveUp,curveDown,currentUp)
+            if store is not None:
+                store.put('mixed',key,[curveUp,curveDown,currentUp])
+
+            if len(curveUp) == 0 or len(curveDown) == 0:
+                print('cost function extrapolations, period '+str(period)+' skipped (missing cost function)')
+            else:
+                print('cost function extrapolations, period '+str(period)+' done')
             
     return [allPeriodsWeightedFunctions,allNbDaysInPeriod]
 
@@ -689,21 +1160,22 @@ def writeCfOneConverterState(allPeriodsFunctions,allPeriodsWeightedFunctions,per
         os.mkdir(loc+folder)
     
     ##################### 6) writing cost functions for each period
-    for periodSet in range(len(allPeriodsFunctions)):
+    allPeriodsFunctions=toCfPoints(allPeriodsFunctions)
+    if saveExtrapolated:
+        allPeriodsWeightedFunctions=toCfPoints(allPeriodsWeightedFunctions)
+    
+    for periodSet in range(allPeriodsFunctions.nbPeriodSets()):
         
         #original cost functions
-        for period in range(len(allPeriodsFunctions[periodSet])):
-            originalPoints=allPeriodsFunctions[periodSet][period]
+        for period in range(allPeriodsFunctions.nbPeriods(periodSet)):
+            originalPoints=allPeriodsFunctions.get(periodSet,period)
             print('costs for period ' + str(period))    
-            pt=np.array(originalPoints)
-            pt=pt.T
-            pt=pt.tolist()
             plt.title('Original points')     
-            plt.scatter(pt[0],pt[1])
+            plt.scatter(originalPoints[:,0],originalPoints[:,1])
             
             header=[storageID+'.deltaSetPoint',storageID+'.costSetPoint'] 
             name='Cf_'+str(len(periodSets[periodSet][0]))+'_'+str(period+1)+'.csv' 
-            df=pd.DataFrame(np.array(originalPoints), columns=header)
+            df=pd.DataFrame(originalPoints, columns=header)
             # df.to_csv(loc+'Costs_rename'+folder+name,sep=';',decimal='.',header=True, index=False) 
             df.to_csv(loc+folder+name,sep=';',decimal='.',header=True, index=False) 
 
@@ -713,26 +1185,22 @@ def writeCfOneConverterState(allPeriodsFunctions,allPeriodsWeightedFunctions,per
         
         if saveExtrapolated:
     		#extrapolated cost functions
-            for period in range(len(allPeriodsFunctions[periodSet])):
+            for period in range(allPeriodsFunctions.nbPeriods(periodSet)):
                 #on considere le mois courant et le prochain
                 nextPeriod=period+1
-                if period+1 >= len(allPeriodsFunctions[periodSet]):
+                if period+1 >= allPeriodsFunctions.nbPeriods(periodSet):
                     nextPeriod=0
                 #coefs=range(5)
                 #coefs=range(23,28)
                 for coef in range(allNbDaysInPeriod[periodSet]):
-                    points=allPeriodsWeightedFunctions[periodSet][period][coef]
-                    #formating
-                    pt=np.array(points)
-                    pt=pt.T
-                    pt=pt.tolist()
+                    points=allPeriodsWeightedFunctions.get(periodSet,period,coef)
                     plt.title('Weighted points')     
-                    plt.scatter(pt[0],pt[1])
+                    plt.scatter(points[:,0],points[:,1])
         
                     header=[storageID+'.deltaSetPoint',storageID+'.costSetPoint'] 
                     name='Cf_'+str(len(periodSets[periodSet][0]))+'_'+str(period)+'-'+str(allNbDaysInPeriod[periodSet]-coef)+'_'+str(nextPeriod)+'-'+str(coef)+'.csv' 
                                         
-                    df=pd.DataFrame(np.array(points), columns=header)
+                    df=pd.DataFrame(points, columns=header)
                     df.to_csv(loc+folder+name,sep=';',decimal='.',header=True, index=False) 
                     
                 print('writting costs, month '+str(period)+' done')
@@ -744,26 +1212,26 @@ def writeCfOneConverterState(allPeriodsFunctions,allPeriodsWeightedFunctions,per
 
 def readCfOneConverterState(nbPeriods,periodSizes,loc,folder):
 
-    allPeriodsFunctions=[]
-    allPeriodsWeightedFunctions=[]
+    allPeriodsFunctions=cfPoints()
+    allPeriodsWeightedFunctions=cfPoints()
     for periodSet in range(len(nbPeriods)):
-        allPeriodsFunctions.append([])
-        allPeriodsWeightedFunctions.append([])
         
         #original cost functions
+        allPoints=[]
         for period in range(nbPeriods[periodSet]):
-            allPeriodsFunctions[periodSet].append([])
             name='\\Cf_'+str(int(periodSizes[periodSet]))+'_'+str(period+1)+'.csv' 
             df=pd.read_csv(loc+folder+name,sep=";", decimal=".")
 
-            points=np.array(df)
-            allPeriodsFunctions[periodSet][period]=points.tolist()
+            points=np.array(df, dtype=float)
+            allPoints.append(points)
             
             print('costs for period ' + str(period))    
-            points=points.T
-            points=points.tolist()
             plt.title('Original points')     
-            plt.scatter(points[0],points[1])
+            plt.scatter(points[:,0],points[:,1])
+        
+        allPeriodsFunctions.addPeriodSet(nbPeriods[periodSet],max([len(points) for points in allPoints]))
+        for period in range(nbPeriods[periodSet]):
+            allPeriodsFunctions.setCurve(periodSet,period,allPoints[period])
 
         plt.show()     
                 
@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 
 import os # On importe le module os qui dispose de variables et de fonctions utiles pour dialoguer avec le systeme d'exploitation       
+import re
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
 from typing import List
 
+#expressions compilees une seule fois pour le modele structure (cle d'une ligne .ini et d'une ligne .xml)
+_INI_KEY = re.compile(r'\s*[#; ]*(.*?)=', re.DOTALL)
+_XML_KEY = re.compile(r'(?:<!--\s*)?<(?![/!?])([^> /\t]*)')
+
 class dataList:
     
     """Classe pour gerer des listes de donnees provenant de fichiers type .init, .xml, .txt, eventuellement .csv
@@ -12,7 +19,9 @@ class dataList:
             - la localisation du fichier : 'loc'
             - une liste de chaine de caracteres (le contenu du fichier) : 'data'
             - une copie du contenu initial (liste de chaine de caracteres) : '_copy'
-            - et c'est tout pour l'instant
+            - un modele structure optionnel, construit par 'buildIndex' : l'index des parametres (cle du parametre -> numeros de ligne) : 'index',
+              la position de la valeur de chaque ligne : '_spans' et le contenu du fichier, mis a jour ligne par ligne : '_content'
+            - le contenu lu ou ecrit en dernier pour chaque fichier (chemin -> contenu), pour ne pas reecrire un fichier inchange : '_written'
         Attention : mauvaise gestion des lignes commentees par paquet
     """
     
@@ -21,6 +30,9 @@ class dataList:
   
         self.name = str(name)
         self.loc = str(loc)
+        self.index = None
+        self._content = None
+        self._written = {}
         
         index=len(self.name)-1
         found=False
@@ -41,6 +53,7 @@ class dataList:
             file.close()
             self.data = fileContent.split("\n")
             self._copy = fileContent.split("\n")
+            self._written[os.path.abspath(self.name)] = fileContent
         elif type(liste)==list:
             self.data=liste
             self._copy=liste.copy()
@@ -68,39 +81,62 @@ class dataList:
             print("readFile : Erreur dans la lecture du fichier (verifier la localisation, le nom, si le fichier n'est pas verouille)")
         else:
             self.data = fileContent.split("\n")
+            self._written[os.path.abspath(name)] = fileContent
+            if self.index is not None:
+                self.buildIndex()
        
-    def writeFile(self, name='currentName', loc='currentLoc'):
+    def writeFile(self, name='currentName', loc='currentLoc', force=False):
         """Methode pour ecrire le contenu de l'attribut 'data' sur un fichier 
-            (par defaut sur le fichier definit par les attributs de l'objet)"""
+            (par defaut sur le fichier definit par les attributs de l'objet)
+            Le fichier n'est pas reecrit si son contenu n'a pas change depuis la derniere lecture ou ecriture par cet objet (sauf si 'force' est a 'True'),
+            sinon il est ecrit dans un fichier temporaire puis renomme, pour qu'un lecteur ne voie jamais un fichier partiellement ecrit
+            Ouput : True si le fichier a ete ecrit"""
         if name=='currentName':
             name=self.name
         if loc=='currentLoc':
             loc=self.loc
+        output=False
         try:
-            content="\n".join(self.data)
+            content=self.content()
             os.chdir(loc)
-            file=open(name, "w")
-            file.write(content)
-            file.close()
+            path=os.path.abspath(name)
+            if force or self._written.get(path) != content or not os.path.isfile(path):
+                self._writeAtomic(path, content)
+                output=True
         except:
             print("writeFile : Erreur dans l'ecriture du fichier (verifier la localisation, le nom, si le fichier n'est pas verouille)")
+        return output
         
     def reinitFile(self):
         """Methode pour reinitialiser le contenu du fichier avec le contenu de la propriete '-copy'"""
         try:
             content="\n".join(self._copy)
             os.chdir(self.loc)
-            file=open(self.name, "w")
+            self._writeAtomic(os.path.abspath(self.name), content)
+        except:
+            print("reinitFile : Erreur dans l'ecriture du fichier (verifier la localisation, le nom, si le fichier n'est pas verouille)")
+    
+    def _writeAtomic(self, path, content):
+        """Methode pour ecrire un fichier dans un fichier temporaire du meme dossier, puis le renommer"""
+        tmpPath = path+'.'+str(os.getpid())+'.tmp'
+        try:
+            file=open(tmpPath, "w")
             file.write(content)
             file.close()
+            os.replace(tmpPath, path)
         except:
-            print("reinitFile : Erreur dans l'ecriture du fichier (verifier la localisation, le nom, si le fichier n'est pas verouille)")
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+        self._written[path] = content
     
     def reinitData(self):
         """Methode pour reinitialiser le contenu de l'attribut 'data' avec le contenu de la propriete '-copy'"""
         while len(self.data) > 0 : self.data.pop()
         for i in range(0, len(self._copy)):
             self.data.append(self._copy[i])
+        if self.index is not None:
+            self.buildIndex()
 
     def isComment(self, index):
         """Methode pour savoir si une ligne est commentee ou non, definie pour les fichiers .ini, .xml et .dat (OPL)
@@ -112,19 +148,11 @@ class dataList:
             if '<!--' in self.data[index]:
                 output=True;     
         elif self.ext == '.ini':
-            i=0
-            firstChar = ' '
-            while i < len(self.data[index]) and firstChar == ' ':
-                firstChar = self.data[index][i]
-                i += 1
+            firstChar = self.data[index].lstrip(' ')[:1]
             if firstChar == ';' or firstChar == '#':
                 output = True
         elif self.ext == '.dat':
-            i=0
-            firstChar = ' '
-            while i < len(self.data[index]) and firstChar == ' ':
-                firstChar = self.data[index][i]
-                i += 1
+            firstChar = self.data[index].lstrip(' ')[:1]
             if firstChar == '/' :
                 output = True
         elif self.ext == '.log':
@@ -133,42 +161,203 @@ class dataList:
             print("isComment : Nom de l'extention inconnu, ou non pris en charge par la fonction, Ouput=False par defaut")
         return output
 
-    def findParam(self,param,start=0, ignoreComments=True, warning=True, reverseSearch=False):
+    def findParam(self,param,start=0, ignoreComments=True, warning=True, reverseSearch=False, useIndex=True):
         """Methode pour trouver un parametre dans l'attribut 'data'
             Input : le nom du parametre, le numero de ligne a partir duquel chercher le parametre (optionnel, utile si ce parametre apparait plusieurs fois), 
-                    si l'on souhaite ignorer les lignes commentees ou non (initialise a 'True', pour les fichiers .ini, .xml, .dat)
+                    si l'on souhaite ignorer les lignes commentees ou non (initialise a 'True', pour les fichiers .ini, .xml, .dat),
+                    si l'on souhaite utiliser l'index s'il a ete construit (initialise a 'True' : seules les lignes dont la cle est exactement le parametre sont testees,
+                    les lignes d'autres cles le contenant sont ignorees ; si aucune ligne de cette cle ne convient, ou avec 'False', recherche ligne par ligne des lignes contenant le parametre)
             Ouput : [le numero de la ligne qui contient le parametre, la ligne complete qui contient le parametre]
         """
         output = [-1,'notFound']
         i=start
-        if(reverseSearch):
-            if (i==0):
-                i=len(self.data)-1
-            if (ignoreComments):
-                while (i >= 0 and not (str(param) in self.data[i] and not (self.isComment(i) and ignoreComments))):
-                    i -= 1
-                if i>=0:
-                    output = [i,self.data[i]]  
+        if self.index is not None and useIndex and self.paramKey(param) in self.index:
+            #recherche dans l'index : seules les lignes dont la cle est le parametre sont testees
+            lines=self.index[self.paramKey(param)]
+            if(reverseSearch):
+                if (i==0):
+                    i=len(self.data)-1
+                candidates=reversed(lines[:bisect_right(lines,i)])
             else:
-                while (i >= 0 and not (str(param) in self.data[i])):
-                    i -= 1
-                if i>=0:
-                    output = [i,self.data[i]]           
-        else:
-            if (ignoreComments):
-                while (i < len(self.data) and not (str(param) in self.data[i] and not (self.isComment(i) and ignoreComments))):
-                    i += 1
-                if i<len(self.data):
-                    output = [i,self.data[i]]  
+                candidates=lines[bisect_left(lines,i):]
+            for i in candidates:
+                if str(param) in self.data[i] and not (ignoreComments and self.isComment(i)):
+                    output = [i,self.data[i]]
+                    break
+        if output == [-1,'notFound']:
+            #recherche ligne par ligne des lignes contenant le parametre (sans index, ou si aucune ligne de la cle ne convient)
+            i=start
+            if(reverseSearch):
+                if (i==0):
+                    i=len(self.data)-1
+                if (ignoreComments):
+                    while (i >= 0 and not (str(param) in self.data[i] and not (self.isComment(i) and ignoreComments))):
+                        i -= 1
+                    if i>=0:
+                        output = [i,self.data[i]]  
+                else:
+                    while (i >= 0 and not (str(param) in self.data[i])):
+                        i -= 1
+                    if i>=0:
+                        output = [i,self.data[i]]           
             else:
-                while (i < len(self.data) and not (str(param) in self.data[i])):
-                    i += 1
-                if i<len(self.data):
-                    output = [i,self.data[i]]  
+                if (ignoreComments):
+                    while (i < len(self.data) and not (str(param) in self.data[i] and not (self.isComment(i) and ignoreComments))):
+                        i += 1
+                    if i<len(self.data):
+                        output = [i,self.data[i]]  
+                else:
+                    while (i < len(self.data) and not (str(param) in self.data[i])):
+                        i += 1
+                    if i<len(self.data):
+                        output = [i,self.data[i]]  
         
         if output == [-1,'notFound'] and warning:
             print ("findParam : Parametre introuvable, ouput par defaut : [-1,'notFound']")
         return output            
+
+    def findAllParams(self, param, start=0, ignoreComments=True):
+        """Methode pour trouver toutes les lignes de l'attribut 'data' contenant un parametre, en un seul parcours
+            Input : le nom du parametre, le numero de ligne a partir duquel chercher le parametre (optionnel), 
+                    si l'on souhaite ignorer les lignes commentees ou non (initialise a 'True', pour les fichiers .ini, .xml, .dat)
+            Ouput : la liste des numeros des lignes qui contiennent le parametre
+            L'index n'est pas utilise : toutes les lignes contenant le parametre (sous-chaine) sont trouvees, y compris celles d'autres cles le contenant
+        """
+        return [i for i in range(start,len(self.data)) if str(param) in self.data[i] and not (ignoreComments and self.isComment(i))]
+
+    def buildIndex(self):
+        """Methode pour construire le modele structure du fichier (index des parametres, position des valeurs et contenu), defini pour les fichiers .ini et .xml
+            Une fois l'index construit, la recherche d'un parametre qui est une cle (nom avant le '=' pour les .ini, balise pour les .xml, avec ou sans '<' '>')
+            ne teste que les lignes de cette cle (findParam, sauf avec useIndex=False). Pour les autres parametres, et si aucune ligne de la cle ne convient,
+            la recherche ligne par ligne (sous-chaine) est conservee.
+            Les valeurs sont changees a partir de leur position dans la ligne, et seules les lignes modifiees sont remplacees dans le contenu lors de l'ecriture.
+            Le modele est mis a jour par changeParamValue et commentParam (et les methodes associees), et reconstruit par readFile, reinitData, clean et fill :
+            l'attribut 'data' ne doit donc pas etre modifie directement (sinon, reconstruire le modele avec buildIndex).
+            Input : 
+            Ouput : l'index
+        """
+        self.index={}
+        self._lineKeys=[]
+        self._spans=[]
+        for i in range(len(self.data)):
+            key=self.lineKey(i)
+            self._lineKeys.append(key)
+            self._spans.append(self.valueSpan(i))
+            if key is not None:
+                if key in self.index:
+                    self.index[key].append(i)
+                else:
+                    self.index[key]=[i]
+        self._content="\n".join(self.data)
+        self._lengths=list(accumulate(map(len,self.data), initial=0))
+        self._shifts={}
+        self._edited=set()
+        return self.index
+
+    def updateIndex(self, index):
+        """Methode pour mettre a jour le modele structure apres la modification d'une ligne
+            Input : index de la ligne (element de la liste 'data')
+            Ouput : 
+        """
+        if self.index is None:
+            return
+        key=self.lineKey(index)
+        previousKey=self._lineKeys[index]
+        if key != previousKey:
+            if previousKey is not None:
+                self.index[previousKey].remove(index)
+                if len(self.index[previousKey]) == 0:
+                    del self.index[previousKey]
+            if key is not None:
+                if key in self.index:
+                    insort(self.index[key],index)
+                else:
+                    self.index[key]=[index]
+            self._lineKeys[index]=key
+        self._spans[index]=self.valueSpan(index)
+        self._edited.add(index)
+
+    def lineKey(self, index):
+        """Methode pour obtenir la cle du parametre d'une ligne, commentee ou non (nom avant le '=' pour les .ini, balise pour les .xml)
+            Input : index de la ligne (element de la liste 'data')
+            Ouput : la cle, ou None si la ligne ne definit pas de parametre
+        """
+        if self.ext == '.ini':
+            match=_INI_KEY.match(self.data[index])
+            if match:
+                return match.group(1).strip()
+        elif self.ext == '.xml':
+            match=_XML_KEY.match(self.data[index].strip())
+            if match:
+                return match.group(1)
+        return None
+
+    def valueSpan(self, index):
+        """Methode pour obtenir la position de la valeur du parametre d'une ligne (apres le '=' pour les .ini, entre '>' et '</' pour les .xml)
+            Input : index de la ligne (element de la liste 'data')
+            Ouput : (debut, fin) de la valeur dans la ligne, ou None si la ligne n'a pas de valeur
+        """
+        line=self.data[index]
+        if self.ext == '.ini':
+            index1=line.find('=')
+            if index1 >= 0:
+                return (index1+1,len(line))
+        elif self.ext == '.xml':
+            index1=line.find('>')
+            index2=line.find('</')
+            if index1 >= 0 and index2 >= 0:
+                return (index1+1,index2)
+        return None
+
+    def lineOffset(self, index):
+        """Methode pour obtenir la position du debut d'une ligne dans le contenu du modele structure (avant les modifications non encore reportees)
+            Input : index de la ligne (element de la liste 'data', ou le nombre de lignes pour la fin du contenu)
+            Ouput : la position
+        """
+        offset=self._lengths[index]+index
+        for line, shift in self._shifts.items():
+            if line < index:
+                offset += shift
+        return offset
+
+    def content(self):
+        """Methode pour obtenir le contenu du fichier (les lignes de l'attribut 'data' separees par des retours a la ligne)
+            Si le modele structure est construit, seules les lignes modifiees depuis le dernier appel sont remplacees dans le contenu.
+            Input : 
+            Ouput : le contenu (chaine de caracteres)
+        """
+        if self._content is None or len(self._lengths) != len(self.data)+1:
+            return "\n".join(self.data)
+        if len(self._edited) > 0:
+            pieces=[]
+            shifts={}
+            position=0
+            for i in sorted(self._edited):
+                start=self.lineOffset(i)
+                end=self.lineOffset(i+1)-1
+                pieces.append(self._content[position:start])
+                pieces.append(self.data[i])
+                position=end
+                shifts[i]=len(self.data[i])-(end-start)
+            pieces.append(self._content[position:])
+            self._content=''.join(pieces)
+            self._edited=set()
+            for i in shifts:
+                self._shifts[i]=self._shifts.get(i,0)+shifts[i]
+            if len(self._shifts) > 64:
+                self._lengths=list(accumulate(map(len,self.data), initial=0))
+                self._shifts={}
+        return self._content
+
+    def paramKey(self, param):
+        """Methode pour obtenir la cle correspondant a un parametre recherche ('<balise>' et 'balise' ont la meme cle pour les .xml)
+            Input : le nom du parametre
+            Ouput : la cle
+        """
+        key=str(param).strip()
+        if self.ext == '.xml' and key.startswith('<') and key.endswith('>') and not key.startswith('</'):
+            key=key[1:-1]
+        return key
     
 
     #Cherche la valeur d'un parametre dans une liste de chaines de caractere (construite pour les fichiers Persee, pas robuste)
@@ -202,13 +391,7 @@ class dataList:
                     index=line.index('=')
                     output=line[-(len(line)-index-1):] 
             elif self.ext == '.csv':
-                index=len(line)-1
-                found=False
-                while index > 0 and not found:
-                    if line[index]==';':
-                        found=True
-                    else: 
-                        index -= 1
+                index=max(line.rfind(';',1),0)
                 output=line[-(len(line)-index-1):] 
             else :
                 print("findParamValue : Nom de l'extention inconnu, ou non pris en charge par la fonction, ouput='notFound' par defaut")
@@ -230,40 +413,58 @@ class dataList:
         output=False
         
         if line[1] !='notFound':
-            output=True
-            if self.ext == '.xml':
+            output=self.changeLineValue(line[0], new)
                 
-                index1=line[1].index('>')
-                index2=line[1].index('</')
-                self.data[line[0]]=line[1][:index1+1]+str(new)+line[1][-(len(line[1])-index2):]
-                #print("Ligne numero " + str(line[0]) + ", nouveau contenu : "+ str(self.data[line[0]]))
+        return output
+    
+    def changeLineValue(self, index, new):
+        """Methode pour changer la valeur du parametre d'une ligne donnee de l'attribut 'data', definie pour les fichiers .ini, .xml, .dat
+            Input : index de la ligne (element de la liste 'data'), la nouvelle valeur
+            Ouput : True si la ligne a ete modifiee
+        """
+        line=[index,self.data[index]]
+        output=True
+        span=self._spans[index] if self._content is not None else None
+        if span is not None:
             
-            elif self.ext == '.dat':
-                
-                if 'SheetRead' in line[1] or 'SheetWrite' in line[1]:
-                    index1=line[1].index('!')+1
-                    index2=line[1].index(')')-1
-                    self.data[line[0]]=line[1][:index1]+str(new)+line[1][index2:]
-                elif 'SheetConnection' in line[1]:
-                    index1=line[1].index('(')+2
-                    index2=line[1].index(')')-1
-                    self.data[line[0]]=line[1][:index1]+str(new)+line[1][index2:]
-                else :
-                    index=line[1].index('=')
-                    self.data[line[0]]=line[1][:index+1]+str(new)
-
-                #print("Ligne numero " + str(line[0]) + ", nouveau contenu : "+ str(self.data[line[0]]))
-                
-            elif self.ext == '.ini':
-                
-                index=line[1].index('=')
-                self.data[line[0]]=line[1][:index+1]+str(new) 
-                #print("Ligne numero " + str(line[0]) + ", nouveau contenu : "+ str(self.data[line[0]]))
-                  
+            self.data[line[0]]=line[1][:span[0]]+str(new)+line[1][span[1]:]
+        
+        elif self.ext == '.xml':
+            
+            index1=line[1].index('>')
+            index2=line[1].index('</')
+            self.data[line[0]]=line[1][:index1+1]+str(new)+line[1][-(len(line[1])-index2):]
+            #print("Ligne numero " + str(line[0]) + ", nouveau contenu : "+ str(self.data[line[0]]))
+        
+        elif self.ext == '.dat':
+            
+            if 'SheetRead' in line[1] or 'SheetWrite' in line[1]:
+                index1=line[1].index('!')+1
+                index2=line[1].index(')')-1
+                self.data[line[0]]=line[1][:index1]+str(new)+line[1][index2:]
+            elif 'SheetConnection' in line[1]:
+                index1=line[1].index('(')+2
+                index2=line[1].index(')')-1
+                self.data[line[0]]=line[1][:index1]+str(new)+line[1][index2:]
             else :
-                output=False
-                print("changeParamValue : Nom de l'extention inconnu, ou non pris en charge par la fonction")
-                
+                index=line[1].index('=')
+                self.data[line[0]]=line[1][:index+1]+str(new)
+
+            #print("Ligne numero " + str(line[0]) + ", nouveau contenu : "+ str(self.data[line[0]]))
+            
+        elif self.ext == '.ini':
+            
+            index=line[1].index('=')
+            self.data[line[0]]=line[1][:index+1]+str(new) 
+            #print("Ligne numero " + str(line[0]) + ", nouveau contenu : "+ str(self.data[line[0]]))
+              
+        else :
+            output=False
+            print("changeParamValue : Nom de l'extention inconnu, ou non pris en charge par la fonction")
+        
+        if output:
+            self.updateIndex(line[0])
+        
         return output
     
     def commentParam(self, param, start=0, warning=False):
@@ -274,30 +475,55 @@ class dataList:
         line=self.findParam(param, start, True)
         output=False
         if line[1] !='notFound':
-            output=True
-            if self.ext == '.xml':
-                
-                self.data[line[0]]='<!--'+self.data[line[0]]+'-->'
-                print("Ligne numero " + str(line[0]) + ", commentee.")
-            
-            elif self.ext == '.dat':
-                
-                self.data[line[0]]='//'+self.data[line[0]]
-                print("Ligne numero " + str(line[0]) + ", commentee.")
-                
-            elif self.ext == '.ini':
-                
-                self.data[line[0]]='#'+self.data[line[0]]
-                print("Ligne numero " + str(line[0]) + ", commentee.")        
-
-            else :
-                output=False
-                print("commentParam : Nom de l'extention inconnu, ou non pris en charge par la fonction")
+            output=self.commentLine(line[0])
 
         else : 
             if warning:
                 print("Parametre introuvable, ou ligne deja commentee.")	
         return output
+    
+    def commentLine(self, index):
+        """Methode pour commenter une ligne donnee de l'attribut 'data', definie pour les fichiers .ini, .xml, .dat
+            Input : index de la ligne (element de la liste 'data')
+            Ouput : True si la ligne a ete commentee
+        """
+        output=True
+        if self.ext == '.xml':
+            
+            self.data[index]='<!--'+self.data[index]+'-->'
+            print("Ligne numero " + str(index) + ", commentee.")
+        
+        elif self.ext == '.dat':
+            
+            self.data[index]='//'+self.data[index]
+            print("Ligne numero " + str(index) + ", commentee.")
+            
+        elif self.ext == '.ini':
+            
+            self.data[index]='#'+self.data[index]
+            print("Ligne numero " + str(index) + ", commentee.")        
+
+        else :
+            output=False
+            print("commentParam : Nom de l'extention inconnu, ou non pris en charge par la fonction")
+        
+        if output:
+            self.updateIndex(index)
+        
+        return output
+    
+    def commentAllParams(self, param, start=0, warning=False):
+        """Methode pour commenter toutes les lignes contenant le parametre donne, en un seul parcours, definie pour les fichiers .ini, .xml, .dat
+            Input : le nom du parametre, le numero de ligne a partir duquel chercher le parametre (optionnel)
+            Ouput : la liste des numeros des lignes commentees
+        """
+        output=[]
+        for i in self.findAllParams(param, start, True):
+            if self.commentLine(i):
+                output.append(i)
+        if output == [] and warning:
+            print("Parametre introuvable, ou ligne deja commentee.")
+        return output
  
     def clean(self, full=False, breakXml = False, ignoreComments=False):
         """Methode pour 'nettoyer' l'attribut 'data': supprime les blancs et les lignes commentees, definie pour les fichiers .ini, .xml, .dat (OPL)
@@ -334,6 +560,9 @@ class dataList:
             while i < len(self.data):
                 self.data[i] = self.cleanStr(self.data[i], right=True)
                 i += 1
+        
+        if self.index is not None:
+            self.buildIndex()
                 
     
     def fill(self,T):
@@ -343,6 +572,8 @@ class dataList:
         """
         while len(self.data) < T:
             self.data.append('')
+        if self.index is not None:
+            self.buildIndex()
 
     
     #Renvoie une liste avec les valeurs de la liste originale "nettoyee" au prealable (construite pour les fichiers Persee, pas robuste)
@@ -389,10 +620,7 @@ class dataList:
                 line=self.data[i]
                 value=''
                 if ';' in line:
-                    j=len(line)-1
-                    while j > 0 and line[j] != ' ' and line[j] != ';':
-                        value=line[j]+value
-                        j=j-1         
+                    value=line[max(line.rfind(' '),line.rfind(';'),0)+1:]
                     value=self.cleanStr(value, full=True)
                     try:
                         #value=float(value)
@@ -441,10 +669,7 @@ class dataList:
                 line=self.data[i]
                 value=''
                 if ';' in line:
-                    j=len(line)-1
-                    while j > 0 and line[j] != ' ' and line[j] != ';':
-                        value=line[j]+value
-                        j=j-1         
+                    value=line[max(line.rfind(' '),line.rfind(';'),0)+1:]
                     
                     line=line.replace(value,'')
   
@@ -465,21 +690,34 @@ class dataList:
             string=string.replace(' ','')
             if self.ext == '.xml':
                 string=string.replace('\t','')
+        #les bornes de la chaine (first, last) sont deplacees, la chaine n'est decoupee qu'une fois a la fin
+        xml = self.ext == '.xml'
+        first=0
+        last=len(string)
         while not (leftClean and rightClean) :
-            if (string[0] != ' ' and self.ext != '.xml') or (self.ext == '.xml' and string[0] != ' ' and string[0:1] != '\t'):
+            if first >= last:
+                raise IndexError('string index out of range')
+            char=string[first]
+            if (char != ' ' and not xml) or (xml and char != ' ' and char != '\t'):
                 leftClean = True
             else:
-                if string[0:1] == '\t':
-                    string=string[2:]
+                if char == '\t':
+                    first=min(first+2,last)
                 else:
-                    string=string[1:]
-            if (string[len(string)-1] != ' ' and self.ext != '.xml') or (self.ext == '.xml' and string[len(string)-1] != ' ' and string[len(string)-2:len(string)] != '\t'):
+                    first+=1
+            if first >= last:
+                raise IndexError('string index out of range')
+            char=string[last-1]
+            tab = last-first == 1 and char == '\t'
+            if (char != ' ' and not xml) or (xml and char != ' ' and not tab):
                 rightClean = True
             else:
-                if string[len(string)-2:len(string)] == '\t':
-                    string=string[:len(string)-2]
+                if tab:
+                    last=first
                 else:
-                    string=string[:len(string)-1]
+                    last-=1
+        if first > 0 or last < len(string):
+            string=string[first:last]
         return string
     
     #Renvoie la liste des parametres du .ini que Persee interpretera comme variable de dimensionnement a optimiser (symbolise par une valeur negative)
@@ -547,23 +785,16 @@ class dataList:
                 
     #Renvoie la liste des parametres du .ini que Persee interpretera comme variable de dimensionnement a optimiser (symbolise par une valeur negative)
     def changeAllParamValues(self, param, new, start=0, ignoreComments=True):
-        """Methode pour changer la valeur de tous les parametres dans l'attribut 'data', definie pour les fichiers .ini, .xml, .dat
+        """Methode pour changer la valeur de tous les parametres dans l'attribut 'data', en un seul parcours, definie pour les fichiers .ini, .xml, .dat
             Input : le nom du parametre, le numero de ligne a partir duquel chercher le parametre (optionnel, utile si ce parametre apparait plusieurs fois), 
                     si l'on souhaite ignorer les lignes commentees ou non (initialise a 'True', pour les fichiers .ini, .xml)
-            Ouput : 
+            Ouput : la liste des numeros des lignes modifiees
         """
-    
-        line=""
-        found=False
-        while line !='notFound':
-
-            lineIndex=self.findParam(param,start,ignoreComments,warning = not found)
-            line=lineIndex[1]
-            index=lineIndex[0]
-           
-            if line !='notFound':
-                self.changeParamValue(param,new,start)
-                found=True
-                
-            start=index+1
-        
+        output=[]
+        lines=self.findAllParams(param, start, ignoreComments)
+        if lines == []:
+            print ("findParam : Parametre introuvable, ouput par defaut : [-1,'notFound']")
+        for i in lines:
+            if self.changeLineValue(i, new):
+                output.append(i)
+        return output
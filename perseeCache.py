@@ -0,0 +1,17 @@
+from sqliteStore import lruStore
+
+class perseeCache(lruStore):
+
+    """A persistent (on disk) cache of Persee results, to avoid running several times the same computation (see lruStore).
+        Entries are keyed by a hash of everything that determines a Persee run: the content of the Persee files (settings, config, desc)
+        once modified for the run, the representative period data file and the name of the parameter read in the results.
+        Each entry holds the value returned by runPerseeBatch (computation time, -1 or -2) and the cost read in the PLAN file.
+    """
+
+    def __init__(self, path, maxEntries=100000):
+
+        lruStore.__init__(self, path, 'runs', ['status REAL', 'cost REAL'], maxEntries)
+
+    def decode(self, row):
+        #[status, cost]
+        return [row[0],row[1]]
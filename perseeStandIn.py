@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+
+def perseeStandIn(loc='.', nameSettings='settings.ini', nameConfig='config.xml', namePLAN='results_PLAN.csv', nameFbsfLog='FbsfFramework.log',
+                  costID='UnDiscounted Net OPEX ;', sleep=0., timeLimitRate=0., unknownRate=0., seed=0, maxDelta=None):
+    """Stand-in for Persee, to run and profile the cost functions computation without the Persee software.
+    Reads the settings and config files (as modified for the run) and the representative period data file given in the config file,
+    waits for 'sleep' seconds, then writes a PLAN file with a plausible cost and a log file.
+    A share of the runs can end with a time limit ('timeLimitRate', the cost is still written) or without solution ('unknownRate', no cost written),
+    the outcome of a run only depends on its input files and on 'seed'.
+    Runs whose storage level variation (final minus initial state of charge) exceeds 'maxDelta' in absolute value are unfeasible (no cost written).
+    Only the standard library is used, so that the script can be copied and run in any Persee folder.
+    Returns the outcome ('Optimal', 'TimeLimit' or 'Unknown')"""
+
+    settings=readLines(os.path.join(loc,nameSettings))
+    config=readLines(os.path.join(loc,nameConfig))
+
+    #reading the storage levels and the state of the converter
+    initSoc=float(findIniValue(settings,'.InitSOC',0.))
+    finalSoc=float(findIniValue(settings,'.FinalSOC',0.))
+    absInitialState=findIniValue(settings,'.AbsInitialState','1')
+
+    #reading the representative period data (first column: time, 3 header lines below the names)
+    dataFile=findXmlCsvValue(config)
+    data=[]
+    if dataFile is not None and os.path.isfile(os.path.join(loc,dataFile)):
+        for line in readLines(os.path.join(loc,dataFile))[4:]:
+            values=line.split(';')[1:]
+            try:
+                data.append(sum([float(value) for value in values]))
+            except ValueError:
+                pass
+
+    #outcome of the run, drawn from the inputs
+    h=hashlib.sha256(('\n'.join(settings)+'\n'.join(config)+str(seed)).encode('utf-8'))
+    draw=random.Random(int(h.hexdigest(),16)).random()
+    if draw < unknownRate or (maxDelta is not None and abs(finalSoc-initSoc) > maxDelta):
+        outcome='Unknown'
+    elif draw < unknownRate+timeLimitRate:
+        outcome='TimeLimit'
+    else:
+        outcome='Optimal'
+
+    time.sleep(sleep)
+
+    #plausible cost: proportional to the energy to supply, increasing with the energy stored over the period (convex), higher with the converter off
+    delta=finalSoc-initSoc
+    base=1000.+0.1*sum(data)
+    cost=base*(1+0.5*delta+0.2*delta*delta)
+    if str(absInitialState).strip()=='0':
+        cost+=0.02*base
+
+    if os.path.isfile(os.path.join(loc,namePLAN)):
+        os.remove(os.path.join(loc,namePLAN))
+    if outcome != 'Unknown':
+        writeLines(os.path.join(loc,namePLAN), ['Persee stand-in results ;', 'Number of time steps ; '+str(len(data)), costID+' '+repr(cost)])
+
+    log=['Persee stand-in', 'Data file : '+str(dataFile)]
+    if outcome == 'TimeLimit':
+        log.append('Best Feasible (TimeLimit Reached)')
+    log.append('Resultat optim :  "'+outcome+'"')
+    writeLines(os.path.join(loc,nameFbsfLog), log)
+
+    return outcome
+
+def readLines(path):
+    file=open(path,'r')
+    content=file.read()
+    file.close()
+    return content.split('\n')
+
+def writeLines(path, lines):
+    file=open(path,'w')
+    file.write('\n'.join(lines)+'\n')
+    file.close()
+
+def findIniValue(lines, suffix, default):
+    #value of the first uncommented parameter whose name ends with the given suffix
+    for line in lines:
+        stripped=line.strip()
+        if stripped[:1] in ('#',';') or '=' not in stripped:
+            continue
+        name,value=stripped.split('=',1)
+        if name.strip().endswith(suffix):
+            return value.strip()
+    return default
+
+def findXmlCsvValue(lines):
+    #value of the first uncommented xml parameter which is a .csv file
+    for line in lines:
+        if '<!--' in line or '>' not in line or '</' not in line:
+            continue
+        value=line[line.index('>')+1:line.index('</')].strip()
+        if value.endswith('.csv'):
+            return value
+    return None
+
+if __name__ == '__main__':
+    #options can be given on the command line, or through environment variables (inherited by the processes running Persee)
+    parser=argparse.ArgumentParser(description='Stand-in for Persee')
+    parser.add_argument('--loc', default='.')
+    parser.add_argument('--settings', default=os.environ.get('PERSEE_STANDIN_SETTINGS','settings.ini'))
+    parser.add_argument('--config', default=os.environ.get('PERSEE_STANDIN_CONFIG','config.xml'))
+    parser.add_argument('--plan', default=os.environ.get('PERSEE_STANDIN_PLAN','results_PLAN.csv'))
+    parser.add_argument('--log', default=os.environ.get('PERSEE_STANDIN_LOG','FbsfFramework.log'))
+    parser.add_argument('--costID', default=os.environ.get('PERSEE_STANDIN_COSTID','UnDiscounted Net OPEX ;'))
+    parser.add_argument('--sleep', type=float, default=float(os.environ.get('PERSEE_STANDIN_SLEEP',0.)))
+    parser.add_argument('--timeLimitRate', type=float, default=float(os.environ.get('PERSEE_STANDIN_TIMELIMIT_RATE',0.)))
+    parser.add_argument('--unknownRate', type=float, default=float(os.environ.get('PERSEE_STANDIN_UNKNOWN_RATE',0.)))
+    parser.add_argument('--seed', type=int, default=int(os.environ.get('PERSEE_STANDIN_SEED',0)))
+    parser.add_argument('--maxDelta', type=float, default=float(os.environ['PERSEE_STANDIN_MAX_DELTA']) if os.environ.get('PERSEE_STANDIN_MAX_DELTA','') != '' else None)
+    args=parser.parse_args()
+
+    perseeStandIn(args.loc, args.settings, args.config, args.plan, args.log, args.costID, args.sleep, args.timeLimitRate, args.unknownRate, args.seed, args.maxDelta)
+    sys.exit(0)
@@ -1,4 +1,6 @@
 from docplex.mp.model import Model
+from docplex.mp.constants import EffortLevel
+import numpy as np
 import matplotlib.pyplot as plt
 plt.style.use('seaborn-whitegrid')
 
@@ -26,6 +28,14 @@ class representativePeriods:
             - the number of bins to consider (methodological parameter, 40 by default): nBins 
             - the bin construction method (1 by default): binMethod (changes the step definition)
             - the rebuild method: rebuildMethod ('basic' by default, or 'squared' or 'durationCurve')
+            - the engine used to build the bins and the parameters L and AA: engine ('numpy' by default, or 'python'), both give identical results
+            - a model template (rpModelTemplate) shared by periods with the same structure, to avoid building the model for each period: template
+            - the selection method: selector ('milp' by default, the model of Poncelet K. & al. solved with CPLEX, or 'heuristic', a greedy selection
+              improved by swaps of the selected periods, with weights computed by non negative least squares, in milliseconds but not optimal)
+            - whether the heuristic selection is given to CPLEX as a MIP start or not: mipStart (True by default)
+            - the tolerance of the screening of candidates: screening (None by default, no screening): optional representative periods whose parameters AA
+              differ by less than this tolerance from an other candidate (largest difference) are not included in the model, 0 removes exact duplicates only
+            - a solution read in a cache of representative periods (rpCache), used instead of computing a selection: cachedSolution
 
             Internal parameters and ouputs:
             - the number of data sets: nbSets
@@ -35,8 +45,12 @@ class representativePeriods:
             - the bins: bins
             - the parameters L (see Poncelet K. & al.): paramL
             - the parameters AA (see Poncelet K. & al.): paramAA
-            - an mathematical programming model (mp model from docplex): mdl
+            - an mathematical programming model (mp model from docplex, None with the heuristic selector): mdl
             - the optimised objective: objective
+            - the solution of the selection (selection, weights, error on each bin of each data set, objective): solution
+            - the total error on duration curves (objective) of each selection method computed (the heuristic selection is always computed): selectorErrors
+            - the size of the model and the solving statistics (candidates before and after the screening, variables, constraints, MIP start, 
+              solving time, final gap and solving time if the gap tolerance was met, None otherwise): modelStats
             - the optimal weights (for each optional representative period) : optWeights
             - the optimal weights, compact version (only for selected periods): optWeightsCompact
             - the optimal weights per time step: optWeightsDt
@@ -61,7 +75,8 @@ class representativePeriods:
     def __init__(self, data, nRP, sRP, dt=1, 
                  weightsOnDataSets=[], imposedPeriods=[], imposePeak=[], 
                  gap=0.01, timeLimit=300, threads=8, 
-                 nBins=40,binMethod=1,rebuildMethod='basic'):
+                 nBins=40,binMethod=1,rebuildMethod='basic',engine='numpy',template=None,selector='milp',
+                 mipStart=True,screening=None,cachedSolution=None):
                 
         try: data[0][0]
         except: data=[data]     
@@ -90,9 +105,15 @@ class representativePeriods:
         
             #parametres pour construire le probleme d'optimisation
             for i in range(nbSets):
-                bins.append(buildBins(data[i],nBins,binMethod))
-                paramL.append(buildL(data[i],nBins, sRPh,binMethod))
-                paramAA.append(buildAA(data[i],nBins,sRPh,dt,binMethod))
+                if engine == 'numpy':
+                    params=buildParams(data[i],nBins,sRPh,dt,binMethod)
+                    bins.append(params[0])
+                    paramL.append(params[1])
+                    paramAA.append(params[2])
+                else:
+                    bins.append(buildBins(data[i],nBins,binMethod))
+                    paramL.append(buildL(data[i],nBins, sRPh,binMethod))
+                    paramAA.append(buildAA(data[i],nBins,sRPh,dt,binMethod))
             
             #recherche du pic sur chaque serie si l'option est activee
             for i in range(len(imposePeak)):
@@ -106,105 +127,170 @@ class representativePeriods:
         except:
             print('ERROR when building parameters')
         
-        #model MILP
-        mdl = Model(name='representPeriods')
-        mdl.parameters.mip.tolerances.mipgap=gap            
-        mdl.set_time_limit(float(timeLimit))  
-        if threads > 0:
-            mdl.context.cplex_parameters.threads = threads
+        #heuristic selection (fast), used as the selection or compared to the optimal one, nothing is computed if the solution is read in a cache
+        fixed=list(imposedPeriods)+[peak for peak in peaks if peak > 0]
+        if cachedSolution is not None:
+            heuristic=None
+            selectorErrors=dict(cachedSolution['selectorErrors'])
+        else:
+            heuristic=selectHeuristic(paramL, paramAA, nRP, sRP, totWeight, fixed, weightsOnDataSets)
+            selectorErrors={'heuristic':heuristic[3]}
+        solveModel=cachedSolution is None and selector != 'heuristic'
+        
+        #candidates included in the model: near-duplicate optional representative periods are screened out if asked (the periods of the heuristic
+        #selection and the imposed periods are kept)
+        modelORP=setORP
+        if screening is not None and solveModel:
+            modelORP=set(screenCandidates(paramAA, screening, [i for i in setORP if heuristic[0][i] == 1]+fixed, weightsOnDataSets))
+            print('Screening of candidates: '+str(len(modelORP))+' optional representative periods kept out of '+str(nORP))
+        
+        #model MILP: built for this period, or the model template shared with the periods of same structure (only coefficients are updated)
+        #the template is only used with positive weights on the data sets (linearised error), and the model is built if its update fails
+        useTemplate=(solveModel and template is not None and len(modelORP) == nORP and template.matches(nbPdt, nbSets, nRP, sRP, dt, nBins)
+                     and all(weight > 0 for weight in weightsOnDataSets))
+        if useTemplate:
+            try:
+                template.update(paramL, paramAA, imposedPeriods, peaks)
+            except:
+                print('Error when updating the model template, the model is built for this period')
+                useTemplate=False
+        
+        if not solveModel:
+            mdl=None
+        elif useTemplate:
+            mdl=template.mdl
+            selected=template.selected
+            weights=template.weights
+            error=template.error
+        else:
+            mdl = Model(name='representPeriods')
+            mdl.parameters.mip.tolerances.mipgap=gap            
+            mdl.set_time_limit(float(timeLimit))  
+            if threads > 0:
+                mdl.context.cplex_parameters.threads = threads
 
-        #variables
-        try:
-           selected=mdl.binary_var_dict(setORP, name="u")
-           weights=mdl.continuous_var_dict(setORP, lb=0, name="w")
+            #variables
+            try:
+               selected=mdl.binary_var_dict(modelORP, name="u")
+               weights=mdl.continuous_var_dict(modelORP, lb=0, name="w")
         
-           error=[]
-           for n in range(nbSets):
-               error.append(mdl.continuous_var_dict(setBins,lb=0))
-        except:
-            print('Error when defining variables')
+               error=[]
+               for n in range(nbSets):
+                   error.append(mdl.continuous_var_dict(setBins,lb=0))
+            except:
+                print('Error when defining variables')
 
-        #constraints
-        try:
-            mdl.add_constraint( mdl.sum_vars(selected[i] for i in setORP) == nRP )
-            mdl.add_constraint( mdl.sum_vars(weights[i] for i in setORP) == totWeight )
+            #constraints
+            try:
+                mdl.add_constraint( mdl.sum_vars(selected[i] for i in modelORP) == nRP )
+                mdl.add_constraint( mdl.sum_vars(weights[i] for i in modelORP) == totWeight )
             
-            if sRP > 1: #on ajoute cette contrainte pour eviter que 2 periodes selectionnees ne se chevauchent
-                for i in setORP:
-                    if i < nORP-sRP-1:
-                        mdl.add_constraint( mdl.sum_vars(selected[ii] for ii in range(i,i+sRP)) <= 1 )
-                    else:  
-                        mdl.add_constraint( mdl.sum_vars(selected[ii] for ii in range(i,nORP)) <= 1 )
+                if sRP > 1: #on ajoute cette contrainte pour eviter que 2 periodes selectionnees ne se chevauchent
+                    for i in modelORP:
+                        if i < nORP-sRP-1:
+                            mdl.add_constraint( mdl.sum_vars(selected[ii] for ii in range(i,i+sRP) if ii in modelORP) <= 1 )
+                        else:  
+                            mdl.add_constraint( mdl.sum_vars(selected[ii] for ii in range(i,nORP) if ii in modelORP) <= 1 )
 
 
-            for n in range(nbSets):
-                for i in setBins:
-                    mdl.add_constraint( mdl.abs(paramL[n][i] - mdl.sum(weights[j]*paramAA[n][j][i]/totWeight for j in setORP)) == error[n][i] )
+                for n in range(nbSets):
+                    for i in setBins:
+                        mdl.add_constraint( mdl.abs(paramL[n][i] - mdl.sum(weights[j]*paramAA[n][j][i]/totWeight for j in modelORP)) == error[n][i] )
                 
-            for j in setORP:
-                mdl.add_constraint( weights[j] <= selected[j]*totWeight)
+                for j in modelORP:
+                    mdl.add_constraint( weights[j] <= selected[j]*totWeight)
       
-            for i in range(len(imposedPeriods)):
-                mdl.add_constraint( selected[imposedPeriods[i]] == 1 )
+                for i in range(len(imposedPeriods)):
+                    mdl.add_constraint( selected[imposedPeriods[i]] == 1 )
             
-            if len(imposePeak)>0:
-                for n in range(len(peaks)):
-                    if (peaks[n]>0):
-                        mdl.add_constraint( selected[peaks[n]] == 1 )
+                if len(imposePeak)>0:
+                    for n in range(len(peaks)):
+                        if (peaks[n]>0):
+                            mdl.add_constraint( selected[peaks[n]] == 1 )
                 
-            #objective 
-            totalError = 0
-            i=0
-            for n in range (nbSets):
-                if weightsOnDataSets==[]:
-                    totalError += mdl.sum_vars(error[n][i] for i in setBins)  
-                else:
-                    totalError += mdl.sum_vars(error[n][i] for i in setBins)*weightsOnDataSets[i]
-                    i+=1
+                #objective 
+                totalError = 0
+                i=0
+                for n in range (nbSets):
+                    if weightsOnDataSets==[]:
+                        totalError += mdl.sum_vars(error[n][i] for i in setBins)  
+                    else:
+                        totalError += mdl.sum_vars(error[n][i] for i in setBins)*weightsOnDataSets[i]
+                        i+=1
              
-            mdl.minimize(totalError)
-        except:
-            print('Error when defining constraints or objective')
+                mdl.minimize(totalError)
+            except:
+                print('Error when defining constraints or objective')
+        
+        #MIP start: the heuristic selection (the weights and errors are computed by CPLEX for this selection)
+        if solveModel and mipStart:
+            try:
+                mdl.clear_mip_starts()
+                start={}
+                for i in modelORP:
+                    start[selected[i]]=heuristic[0][i]
+                mdl.add_mip_start(mdl.new_solution(start), effort_level=EffortLevel.SolveMIP)
+            except:
+                print('Error when defining the MIP start')
        
-        mdl.print_information()
-    
-    
-        try:
-            mdl.solve()
-        except:
-            print('Error when solving problem')
+
+        #solution: [selection, weights, error on each bin of each data set, objective]
+        solution=None
+        modelStats=None
+        if cachedSolution is not None:
+            solution=cachedSolution['solution']
+            modelStats=cachedSolution['modelStats']
+            print('Selection read in the cache of representative periods')
+        elif selector == 'heuristic':
+            solution=heuristic
         else:
+            mdl.print_information()
+            modelStats={'candidates':nORP, 'modelCandidates':len(modelORP), 'variables':mdl.number_of_variables, 'binaries':mdl.number_of_binary_variables, 
+                        'constraints':mdl.number_of_constraints, 'mipStart':mipStart, 'mipStartObjective':heuristic[3] if mipStart else None}
+        
+            try:
+                mdl.solve()
+            except:
+                print('Error when solving problem')
+            else:
+                print (mdl.solve_details) 
+                solution=[[selected[i].solution_value if i in modelORP else 0 for i in setORP], [weights[w].solution_value if w in modelORP else 0 for w in setORP], 
+                          [[error[n][i].solution_value for i in setBins] for n in range(nbSets)], mdl.objective_value]
+                selectorErrors['milp']=mdl.objective_value
+                
+                details=mdl.solve_details
+                modelStats['solveTime']=details.time
+                modelStats['gap']=details.mip_relative_gap
+                modelStats['solveTimeIfGapMet']=details.time if details.mip_relative_gap <= gap else None
+                print('Model size and solving statistics: '+str(modelStats))
+            
+        if solution is not None:
             #de-normalising data sets
             for i in range(len(data)):
                 data[i]=[data[i][j]*maxi[i] for j in range(len(data[i]))]
-            
-            
-            print (mdl.solve_details) 
         
             #gather results
-            optSelPeriods = [selected[i].solution_value for i in setORP]
-            optSelPeriodsCompact = [i for i in setORP if selected[i].solution_value == 1]
+            optSelPeriods = solution[0]
+            optSelPeriodsCompact = [i for i in setORP if optSelPeriods[i] == 1]
 
-            optWeightsCompact = [weights[w].solution_value for w in setORP]
+            optWeightsCompact = list(solution[1])
             
             
             while len(optWeightsCompact) > nRP: 
                 optWeightsCompact.remove(min(optWeightsCompact)) #pour supprimer les valeurs negligeables
             
-            optWeights = [weights[w].solution_value for w in setORP]
+            optWeights = list(solution[1])
             optError = []
             optErrorTot = []
             
             for n in range(nbSets):
-                optError.append([])
-                for i in setBins:
-                    optError[n].append(error[n][i].solution_value)
-            
-                optErrorTot.append( sum (error[n][i].solution_value for i in setBins) )
+                optError.append(list(solution[2][n]))
+                optErrorTot.append( sum (optError[n]) )
     
             print('Selected periods: '+str(optSelPeriodsCompact))
             print('Respective weights: '+str(optWeightsCompact))
             print('Total error on duration curve(s) '+str(optErrorTot))
+            print('Total error (objective) of each selection method: '+str(selectorErrors))
             
             optWeightsDt=list()
             optSelPeriodsDt=list()
@@ -268,6 +354,7 @@ class representativePeriods:
             self.imposedPeriods=imposedPeriods
             self.imposePeak=imposePeak
             self.binMethod=binMethod
+            self.engine=engine
 
             self.nbPdt=nbPdt
             self.nbSets=nbSets
@@ -277,7 +364,11 @@ class representativePeriods:
             self.bins=bins
             self.paramL=paramL
             self.paramAA=paramAA
-            self.objective=mdl.objective_value
+            self.objective=solution[3]
+            self.solution=solution
+            self.selector=selector
+            self.selectorErrors=selectorErrors
+            self.modelStats=modelStats
             self.optSelPeriods=optSelPeriods
             self.optSelPeriodsCompact=optSelPeriodsCompact
             self.optSelPeriodsDt=optSelPeriodsDt
@@ -383,162 +474,199 @@ class representativePeriods:
     def rebuildData (self, rebuildMethod='basic',timeshift=24):
         
         #build the linking matrix, reconstitute the data with representative periods
-        rebuiltData=[[]]
-        lMatrix=[]
-        lList=[]
-        rpUse=[]
-        rpUseHourly=[]
-        errorRebuiltData=[]
+        #the errors between each period and each used optional representative period are computed at once, for all data sets
         
         #normalising data sets
-        maxi=[]
-        dataNorm=[self.data[i].copy() for i in range(len(self.data))]
-        for i in range(len(dataNorm)):
-            maxi.append(max(dataNorm[i]))
-            dataNorm[i]=[dataNorm[i][j]/maxi[i] for j in range(len(dataNorm[i]))]
-    
-        for n in range(self.nbSets):
-            if n > 0:
-                rebuiltData.append([])
-            
-        for i in range(self.nbPdt):
-            lMatrix.append(list())
-            lList.append(-1)
-            for j in range(self.nRP*self.sRPh):
-                lMatrix[i].append(0)
-    
-        #count the usage of each representative period: per period and per time step
-        for i in range(self.nORP):
-            rpUse.append(0)
-    
-        for i in range(self.nbPdt):
-            rpUseHourly.append(0)
-         
-        for i in range(int(self.nbPdt/self.sRPh)): #for each period, we select the best representative period to associate
-    
-            errorBest=-1;
-            previousK=-1
-            countCompact=-1
-            countCompactPrevious=-1
+        data=np.array(self.data, dtype=float)
+        maxi=data.max(axis=1)
+        dataNorm=data/np.where(maxi > 0, maxi, 1)[:,None]
+        
+        nbPeriods=int(self.nbPdt/self.sRPh)
+        candidates=[k for k in range(self.nORP) if self.optWeights[k]>0] #optional representative periods used to rebuild the data
+        
+        #time steps of each period and of each candidate
+        stepsPeriods=np.arange(nbPeriods)[:,None]*self.sRPh + np.arange(self.sRPh)[None,:]
+        stepsCandidates=(np.array(candidates, dtype=int)[:,None]*24/self.dt + np.arange(self.sRPh)[None,:]).astype(int)
+        
+        periods=dataNorm[:,stepsPeriods] #data sets x periods x time steps
+        rps=dataNorm[:,stepsCandidates] #data sets x candidates x time steps
+        
+        #error metric to minimize (data sets x periods x candidates)
+        if rebuildMethod=='durationCurve':
+            periods=-np.sort(-periods, axis=2)
+            rps=-np.sort(-rps, axis=2)
+        differences=np.abs(periods[:,:,None,:] - rps[:,None,:,:])
+        if rebuildMethod=='basic' or rebuildMethod=='durationCurve':
+            errors=differences.sum(axis=3)
+        elif rebuildMethod=='squares':
+            errors=((1+differences)*(1+differences)).sum(axis=3)
+        else:
+            print("The argument rebuildMethod should be 'basic', 'squares' or 'durationCurve' ('basic' by default)")
+            errors=np.zeros(differences.shape[:3])
+        
+        #accounting for the error on each data set in the total error (with possible attributed weights)
+        if self.weightsOnDataSets==[]:
+            errorsTot=errors.sum(axis=0)
+        else:
+            errorsTot=np.tensordot(np.array(self.weightsOnDataSets[:self.nbSets], dtype=float), errors, axes=1)
+        
+        lList=np.full(self.nbPdt, -1, dtype=int)
+        lMatrix=np.zeros((self.nbPdt, self.nRP*self.sRPh), dtype=int)
+        rpUse=np.zeros(self.nORP, dtype=int)
+        rpUseHourly=np.zeros(self.nbPdt, dtype=int)
+        
+        if len(candidates) > 0:
+            #for each period, we select the best representative period to associate
+            best=np.argmin(errorsTot, axis=1)
+            errorRebuiltData=errorsTot[np.arange(nbPeriods), best].tolist()
             
-            #list of selected representative periods (to be updated)
-            bestRp=[[]]
-            for n in range(self.nbSets):
-                if n > 0:
-                    bestRp.append([])
-                for j in range(self.sRPh):
-                    bestRp[n].append(-1)
-                    
-            #checking each optional representative period
-            for k in range(self.nORP):
-                if (self.optWeights[k]>0):
-                    error=[]
-                    errorTot=0
-                    countCompact=countCompact+1
-                    #computing the error for each data set
-                    
-                    weightIndex=0
-                    for n in range(self.nbSets):
-                        error.append(0)
-
-                        #error metric to minimize
-                        if rebuildMethod=='basic':
-               
-                            for l in range(self.sRPh):
-                                error[n] = error[n] + abs(dataNorm[n][int(i*self.sRPh+l)] - dataNorm[n][int(k*24/self.dt+l)])
-                        
-                        elif rebuildMethod=='squares':
-                            for l in range(self.sRPh):
-                                error[n] = error[n] + (1+abs(dataNorm[n][int(i*self.sRPh+l)] - dataNorm[n][int(k*24/self.dt+l)]))*(1+abs(dataNorm[n][int(i*self.sRPh+l)] - dataNorm[n][int(k*24/self.dt+l)]))
-                        
-                        elif rebuildMethod=='durationCurve':
-                            dcRp=list()
-                            dcOriginal=list()
-                            
-                            for l in range(self.sRPh):
-                                dcRp.append(dataNorm[n][int(k*24/self.dt+l)])
-                                dcOriginal.append(dataNorm[n][i*self.sRPh+l])
-    
-                            dcRp.sort(reverse=True)
-                            dcOriginal.sort(reverse=True)
-    
-                            for l in range(self.sRPh):
-                                error[n] = error[n] + abs(dcRp[l] - dcOriginal[l])
-                        
-                        #accounting for the error on the current data set in the total error (with possible attributed weights)
-                        if self.weightsOnDataSets==[]:
-                            errorTot = errorTot + error[n]
-                        else:
-                            errorTot = errorTot + error[n]*self.weightsOnDataSets[weightIndex]
-                            weightIndex += 1
-
-                    #update best candidate
-                    if (errorBest < 0 or errorTot < errorBest):
-                        errorBest = errorTot
-                        
-                        #note representative period usage (per representative period)
-                        rpUse[k]+=1
-                        if(previousK>-1):
-                            rpUse[previousK]=rpUse[previousK]-1
-                         
-                        
-                        for m in range(self.sRPh):
-                            for n in range(self.nbSets):
-                                bestRp[n][m] = self.data[n][int(k*24/self.dt+m)]
-    
-                            #note representative period usage (per hour)
-                            rpUseHourly[int(k*24/self.dt+m)]+=1
-                            if(previousK>-1):
-                                rpUseHourly[int(previousK*24/self.dt+m)]-=1
-                                      
-                            #update matrix
-                            lMatrix[i*self.sRPh+m][countCompact*self.sRPh+m] = 1
-                            if(countCompactPrevious > -1):
-                                lMatrix[i*self.sRPh+m][countCompactPrevious*self.sRPh+m] = 0
-                        
-                            #update list
-                            lList[i*self.sRPh+m] = k
-                        
-                        previousK=k
-                        countCompactPrevious=countCompact
-                                
             #update our rebuilt data with representative periods
-            errorRebuiltData.append(errorBest)
-            for n in range(self.nbSets):
-                for m in range(self.sRPh):
-                    rebuiltData[n].append(bestRp[n][m])
-                    
+            rebuiltData=data[:,stepsCandidates[best]].reshape(self.nbSets,-1).tolist()
             
-            #build the representative periods file for Persee
-            visualisationList=[]
-            perseeList=lList.copy()
-            #removing the '-1' which correspond to the left values if the size of representative periods is not a multiple of 365
-            perseeList = [value for value in perseeList if value != -1]
-
-            uniqueList=list(dict.fromkeys(perseeList))
+            #note representative period usage (per representative period and per time step)
+            np.add.at(rpUse, np.array(candidates)[best], 1)
+            np.add.at(rpUseHourly, stepsCandidates[best], 1)
             
-            for j in range(len(perseeList)):
-                for i in range(len(uniqueList)):
-                    if perseeList[j] == uniqueList[i]:
-                        break
-                perseeList[j] = i*self.sRPh+j%self.sRPh
-                if i not in visualisationList: 
-                    visualisationList.append(i)
-                    
-            #timeshifting to match with Pegase rolling horizon
-            perseeList+=perseeList[0:timeshift]
-            del perseeList[0:timeshift]
-            perseeList=perseeList[len(perseeList)-1:len(perseeList)]+perseeList
-            del perseeList[len(perseeList)-1:len(perseeList)]
+            #update matrix and list
+            lMatrix[stepsPeriods, best[:,None]*self.sRPh + np.arange(self.sRPh)[None,:]]=1
+            lList[stepsPeriods]=np.array(candidates)[best][:,None]
+        else:
+            errorRebuiltData=[-1 for i in range(nbPeriods)]
+            rebuiltData=[[-1 for i in range(nbPeriods*self.sRPh)] for n in range(self.nbSets)]
+        
+        #build the representative periods file for Persee
+        #removing the '-1' which correspond to the left values if the size of representative periods is not a multiple of 365
+        used=lList[lList != -1]
+        
+        #representative periods are numbered by order of first use
+        uniqueList,firstUse,inverse=np.unique(used, return_index=True, return_inverse=True)
+        order=np.argsort(np.argsort(firstUse))
+        perseeList=(order[inverse]*self.sRPh + np.arange(len(used)) % self.sRPh).tolist()
+        visualisationList=list(range(len(uniqueList)))
+                
+        #timeshifting to match with Pegase rolling horizon
+        perseeList+=perseeList[0:timeshift]
+        del perseeList[0:timeshift]
+        perseeList=perseeList[len(perseeList)-1:len(perseeList)]+perseeList
+        del perseeList[len(perseeList)-1:len(perseeList)]
+        
+        self.rebuiltData=rebuiltData
+        self.lMatrix=lMatrix.tolist()
+        self.rpUse=rpUse.tolist()
+        self.rpUseHourly=rpUseHourly.tolist()
+        self.errorRebuiltData=errorRebuiltData
+        self.lList=lList.tolist()
+        self.perseeList=perseeList
+        self.visualisationList=visualisationList
+            
+
+class rpModelTemplate:
+    
+    """A template of the MILP model used to select representative periods, to be reused by all the periods with the same structure
+        (same number of time steps, number of data sets, nRP, sRP, dt and nBins): the variables, the constraints on the number of selected periods,
+        on overlapping periods and on the weights are built once, only the coefficients L and AA, the right hand sides and the imposed periods
+        (lower bounds of the selection variables) are updated for each period.
+        The absolute error on each bin is linearised (the error is greater than the difference and than its opposite, the total error being minimised),
+        so the weights on the data sets must be positive: with a weight of 0, the error of the data set is not bounded above.
+        The class is composed of the following attributes:
             
-            self.rebuiltData=rebuiltData
-            self.lMatrix=lMatrix
-            self.rpUse=rpUse
-            self.rpUseHourly=rpUseHourly
-            self.errorRebuiltData=errorRebuiltData
-            self.lList=lList
-            self.perseeList=perseeList
-            self.visualisationList=visualisationList
+            - the structure of the model: nbPdt, nbSets, nRP, sRP, dt, nBins, nORP, totWeight
+            - the mathematical programming model (mp model from docplex): mdl
+            - the variables: selected, weights, error
+            - the constraints on the error of each bin (error >= difference, error >= -difference): errorUp, errorDown
+            - the selection variables whose lower bound is set to 1 (imposed periods and peaks): fixed
+    """
+    
+    def __init__(self, nbPdt, nbSets, nRP, sRP, dt=1, nBins=40, weightsOnDataSets=[], gap=0.01, timeLimit=300, threads=8):
+        
+        self.nbPdt=nbPdt
+        self.nbSets=nbSets
+        self.nRP=nRP
+        self.sRP=sRP
+        self.dt=dt
+        self.nBins=nBins
+        self.nORP=int(nbPdt/24*dt - sRP + 1)
+        self.totWeight=nbPdt / int(sRP*24/dt)
+        
+        nORP=self.nORP
+        setORP=set(range(nORP))
+        setBins=set(range(nBins))
+        
+        mdl = Model(name='representPeriods')
+        mdl.parameters.mip.tolerances.mipgap=gap            
+        mdl.set_time_limit(float(timeLimit))  
+        if threads > 0:
+            mdl.context.cplex_parameters.threads = threads
+        
+        selected=mdl.binary_var_dict(setORP, name="u")
+        weights=mdl.continuous_var_dict(setORP, lb=0, name="w")
+        error=[]
+        for n in range(nbSets):
+            error.append(mdl.continuous_var_dict(setBins,lb=0))
+        
+        mdl.add_constraint( mdl.sum_vars(selected[i] for i in setORP) == nRP )
+        mdl.add_constraint( mdl.sum_vars(weights[i] for i in setORP) == self.totWeight )
+        if sRP > 1:
+            for i in setORP:
+                if i < nORP-sRP-1:
+                    mdl.add_constraint( mdl.sum_vars(selected[ii] for ii in range(i,i+sRP)) <= 1 )
+                else:  
+                    mdl.add_constraint( mdl.sum_vars(selected[ii] for ii in range(i,nORP)) <= 1 )
+        for j in setORP:
+            mdl.add_constraint( weights[j] <= selected[j]*self.totWeight)
+        
+        totalError = 0
+        i=0
+        for n in range (nbSets):
+            if weightsOnDataSets==[]:
+                totalError += mdl.sum_vars(error[n][i] for i in setBins)  
+            else:
+                totalError += mdl.sum_vars(error[n][i] for i in setBins)*weightsOnDataSets[i]
+                i+=1
+        mdl.minimize(totalError)
+        
+        self.mdl=mdl
+        self.selected=selected
+        self.weights=weights
+        self.error=error
+        self.errorUp=None
+        self.errorDown=None
+        self.fixed=[]
+        
+    def matches(self, nbPdt, nbSets, nRP, sRP, dt, nBins):
+        return (nbPdt, nbSets, nRP, sRP, dt, nBins) == (self.nbPdt, self.nbSets, self.nRP, self.sRP, self.dt, self.nBins)
+        
+    def update(self, paramL, paramAA, imposedPeriods=[], peaks=[]):
+        
+        #error constraints: built with the coefficients of the first period, then updated
+        if self.errorUp is None:
+            self.errorUp=[]
+            self.errorDown=[]
+            for n in range(self.nbSets):
+                self.errorUp.append([])
+                self.errorDown.append([])
+                for i in range(self.nBins):
+                    rebuilt=self.mdl.dot([self.weights[j] for j in range(self.nORP)], [paramAA[n][j][i]/self.totWeight for j in range(self.nORP)])
+                    self.errorUp[n].append(self.mdl.add_constraint( self.error[n][i] + rebuilt >= paramL[n][i] ))
+                    self.errorDown[n].append(self.mdl.add_constraint( self.error[n][i] - rebuilt >= -paramL[n][i] ))
+        else:
+            for n in range(self.nbSets):
+                for i in range(self.nBins):
+                    up=self.errorUp[n][i]
+                    down=self.errorDown[n][i]
+                    for j in range(self.nORP):
+                        coef=paramAA[n][j][i]/self.totWeight
+                        up.lhs.set_coefficient(self.weights[j], coef)
+                        down.lhs.set_coefficient(self.weights[j], -coef)
+                    up.rhs=paramL[n][i]
+                    down.rhs=-paramL[n][i]
+        
+        #imposed periods and peaks
+        for i in self.fixed:
+            self.selected[i].lb=0
+        self.fixed=list(imposedPeriods)+[peak for peak in peaks if peak > 0]
+        for i in self.fixed:
+            self.selected[i].lb=1
             
 
 def buildDc (data, weights=[]) :
@@ -614,3 +742,187 @@ def buildAA (data, nBins, sRPh, dt, method=1) :
             parameterA.append(counter/sRPh)
         parameterAA.append(parameterA)
     return parameterAA
+
+def buildParams (data, nBins, sRPh, dt, method=1) :
+    
+    #builds the bins, the parameter L and the parameter AA at once (same results as buildBins, buildL and buildAA)
+    values=np.asarray(data, dtype=float)
+    nTS = len(values) #number of time steps
+    sortedValues=np.sort(values)
+    
+    if method == 1:
+        #build bins method 1
+        mini=float(sortedValues[0])
+        stepBins=(float(sortedValues[nTS-1])-mini)/(nBins-1)
+        bins=[mini+stepBins*i for i in range(nBins)]
+        
+    elif method == 2:
+        #build bins method 2 (different step definition)
+        stepBins=int(nTS/(nBins))
+        bins=sortedValues[[i*stepBins for i in range(nBins)]].tolist()
+    else:
+        print("The argument method should be 1 or 2 (1 by default)")
+    
+    #percentage of time during wich data exceeds the value of bin i
+    counters=nTS-np.searchsorted(sortedValues, bins, side='left')
+    parameterL=(counters/nTS).tolist()
+    
+    #time steps of each optional representative period, keeping a daily coherence
+    nORP=int(len(data)/24*dt - sRPh/24*dt + 1) #number of optional representative periods
+    steps=(np.arange(nORP)[:,None]*24/dt + np.arange(sRPh)[None,:]).astype(int)
+    
+    #percentage of time during wich each optional representative period exceeds the value of bin i
+    exceed=values[:,None] >= np.array(bins)[None,:]
+    if np.array_equal(steps, steps[:,:1]+np.arange(sRPh)[None,:]):
+        #sliding windows: exceedance counts are obtained from cumulative counts
+        cumulated=np.zeros((nTS+1,nBins), dtype=np.int64)
+        np.cumsum(exceed, axis=0, out=cumulated[1:])
+        counters=cumulated[steps[:,0]+sRPh]-cumulated[steps[:,0]]
+    else:
+        counters=exceed[steps].sum(axis=1)
+    parameterAA=(counters/sRPh).tolist()
+    
+    return [bins, parameterL, parameterAA]
+
+def selectHeuristic (paramL, paramAA, nRP, sRP, totWeight, fixed=[], weightsOnDataSets=[], maxSwaps=10) :
+    
+    #fast selection of representative periods on the parameters L and AA (not optimal): greedy selection, then swaps of the selected periods
+    #(k-medoids like) while the error decreases. The weights are computed by non negative least squares, their sum being the total weight.
+    #The periods in 'fixed' are always selected, selected periods can not overlap (same rule as the MILP).
+    #Returns [selection, weights, error on each bin of each data set, total error], as the solution of the MILP
+    L=np.asarray(paramL, dtype=float) #data sets x bins
+    AA=np.asarray(paramAA, dtype=float) #data sets x optional representative periods x bins
+    nbSets,nORP,nBins=AA.shape
+    if weightsOnDataSets==[]:
+        weightsSets=np.ones(nbSets)
+    else:
+        weightsSets=np.asarray(weightsOnDataSets[:nbSets], dtype=float)
+    
+    #least squares problem: features (candidates x equations) . shares = target, the sum of the shares being 1 (heavily weighted equation)
+    penalty=10.*np.sqrt(nbSets*nBins)
+    features=np.concatenate([(weightsSets[:,None,None]*AA).transpose(1,0,2).reshape(nORP,-1), np.full((nORP,1),penalty)], axis=1)
+    target=np.concatenate([(weightsSets[:,None]*L).ravel(), [penalty]])
+    
+    #overlapping candidates (the overlap constraints of the MILP link each period to the next ones)
+    index=np.arange(nORP)
+    conflicts=np.zeros((nORP,nORP), dtype=bool)
+    if sRP > 1:
+        ends=np.where(index < nORP-sRP-1, index+sRP, nORP)
+        conflicts=(index[None,:] > index[:,None]) & (index[None,:] < ends[:,None])
+        conflicts=conflicts | conflicts.T
+    
+    def allowed(selection):
+        #candidates which can be added to the selection
+        free=np.ones(nORP, dtype=bool)
+        if len(selection) > 0:
+            free&=~conflicts[selection].any(axis=0)
+            free[selection]=False
+        return np.flatnonzero(free)
+    
+    def scores(selection, candidates):
+        #squared residual of the selection completed with each candidate (unconstrained least squares, negative shares set to 0)
+        equations=np.concatenate([np.broadcast_to(features[selection], (len(candidates),len(selection),features.shape[1])), features[candidates][:,None,:]], axis=1)
+        gram=equations @ equations.transpose(0,2,1) + 1e-10*np.eye(len(selection)+1)
+        shares=np.maximum(np.linalg.solve(gram, (equations @ target)[:,:,None])[:,:,0], 0)
+        return (((shares[:,None,:] @ equations)[:,0,:] - target)**2).sum(axis=1)
+    
+    #greedy selection
+    selection=[int(i) for i in dict.fromkeys(fixed) if 0 <= i < nORP]
+    while len(selection) < nRP:
+        candidates=allowed(selection)
+        if len(candidates) == 0:
+            break
+        selection.append(int(candidates[np.argmin(scores(selection, candidates))]))
+    shares,residual=nnls(features[selection].T, target)
+    
+    #swaps of the selected periods (except the fixed ones)
+    for iteration in range(maxSwaps):
+        improved=False
+        for p in range(len(selection)):
+            if selection[p] in fixed:
+                continue
+            others=selection[:p]+selection[p+1:]
+            candidates=allowed(others)
+            if len(candidates) == 0:
+                continue
+            trial=others[:p]+[int(candidates[np.argmin(scores(others, candidates))])]+others[p:]
+            trialShares,trialResidual=nnls(features[trial].T, target)
+            if trialResidual < residual-1e-12:
+                selection,shares,residual=trial,trialShares,trialResidual
+                improved=True
+        if not improved:
+            break
+    
+    #weights (sum equal to the total weight) and errors on duration curves, as in the MILP
+    optSelPeriods=[0 for i in range(nORP)]
+    optWeights=[0. for i in range(nORP)]
+    if len(selection) > 0 and shares.sum() > 0:
+        shares=shares/shares.sum()
+        for k in range(len(selection)):
+            optSelPeriods[selection[k]]=1
+            optWeights[selection[k]]=float(shares[k]*totWeight)
+    error=np.abs(L - np.einsum('j,njb->nb', np.asarray(optWeights)/totWeight, AA))
+    
+    return [optSelPeriods, optWeights, error.tolist(), float((weightsSets*error.sum(axis=1)).sum())]
+
+def nnls (A, b, maxIterations=None) :
+    
+    #non negative least squares (active set method of Lawson & Hanson): minimises ||A x - b|| with x >= 0
+    #returns [x, ||A x - b||]
+    A=np.asarray(A, dtype=float)
+    b=np.asarray(b, dtype=float)
+    m,n=A.shape
+    if maxIterations is None:
+        maxIterations=3*n
+    tolerance=10*np.finfo(float).eps*np.abs(A).sum(axis=0).max(initial=0)*max(m,n)
+    
+    x=np.zeros(n)
+    passive=np.zeros(n, dtype=bool)
+    gradient=A.T @ (b - A @ x)
+    iteration=0
+    while (~passive).any() and gradient[~passive].max() > tolerance and iteration < maxIterations:
+        active=np.flatnonzero(~passive)
+        passive[active[np.argmax(gradient[active])]]=True
+        
+        s=np.zeros(n)
+        s[passive]=np.linalg.lstsq(A[:,passive], b, rcond=None)[0]
+        #variables which would become negative leave the passive set
+        while passive.any() and s[passive].min() <= 0 and iteration < maxIterations:
+            iteration+=1
+            negative=passive & (s <= 0)
+            alpha=np.min(x[negative]/(x[negative]-s[negative]))
+            x+=alpha*(s-x)
+            passive&=x > tolerance
+            s=np.zeros(n)
+            if passive.any():
+                s[passive]=np.linalg.lstsq(A[:,passive], b, rcond=None)[0]
+        x=s
+        gradient=A.T @ (b - A @ x)
+        iteration+=1
+    
+    return [x, float(np.linalg.norm(A @ x - b))]
+
+def screenCandidates (paramAA, tolerance=0., keep=[], weightsOnDataSets=[]) :
+    
+    #screening of near-duplicate optional representative periods: the largest difference between their parameters AA (all bins of all data sets,
+    #with the weights on data sets) is lower or equal to the tolerance. Only the first period of each group of near-duplicates is kept,
+    #the periods in 'keep' are always kept (and considered first).
+    #Dominated periods are not screened: the duration curves are fitted by a weighted combination of the AA vectors, so a period whose AA
+    #vector is above (or below) an other one on every bin can still be needed in the optimal combination.
+    #Returns the optional representative periods kept, in increasing order
+    AA=np.asarray(paramAA, dtype=float) #data sets x optional representative periods x bins
+    nbSets,nORP,nBins=AA.shape
+    if weightsOnDataSets==[]:
+        weightsSets=np.ones(nbSets)
+    else:
+        weightsSets=np.asarray(weightsOnDataSets[:nbSets], dtype=float)
+    features=(weightsSets[:,None,None]*AA).transpose(1,0,2).reshape(nORP,-1)
+    
+    kept=[]
+    for i in list(dict.fromkeys(keep))+list(range(nORP)):
+        if i in kept:
+            continue
+        if i in keep or len(kept) == 0 or np.abs(features[kept]-features[i]).max(axis=1).min() > tolerance:
+            kept.append(i)
+    
+    return sorted(kept)
@@ -0,0 +1,38 @@
+import pickle
+import numpy as np
+from sqliteStore import lruStore, contentKey
+
+class rpCache(lruStore):
+
+    """A persistent (on disk) cache of representative periods solutions, to avoid solving several times the same selection problem (see lruStore).
+        Entries are keyed by a hash of the normalised data of the period (each data series divided by its maximum, as in representativePeriods)
+        and of the selection parameters (nRP, sRP, dt, weights on data sets, imposed periods and peaks, nBins, binMethod, gap, selector, screening):
+        periods with the same length and the same normalised data share their solution, whatever the set of periods they belong to.
+        The time limit, the number of threads and the engine are not part of the key: solutions of the MILP stopped before reaching the gap (time limit)
+        are not stored.
+        Each entry holds the solution of the selection (selection, weights, errors, objective), the errors of the selection methods and the model statistics,
+        the representative periods are rebuilt from the data of the period (see the cachedSolution argument of representativePeriods).
+    """
+
+    def __init__(self, path, maxEntries=100000):
+
+        lruStore.__init__(self, path, 'solutions', ['value BLOB'], maxEntries)
+
+    def key(self, periodData, nRP, sRP, dt, weights, imposedPeriods, imposePeak, nBins, binMethod, gap, selector='milp', screening=None):
+        #periodData: data of the period (time steps x data series)
+        values=np.asarray(periodData, dtype=float)
+        maxi=values.max(axis=0)
+        normalised=np.ascontiguousarray(values/np.where(maxi > 0, maxi, 1)[None,:])
+        
+        return contentKey([str(normalised.shape).encode('ascii')+normalised.tobytes(), nRP, sRP, dt, weights, imposedPeriods, imposePeak, nBins, binMethod, gap, selector, screening])
+
+    def encode(self, rp):
+        #rp: representative periods (representativePeriods) whose solution is stored, if the gap was reached
+        if rp.modelStats is not None and rp.modelStats.get('solveTimeIfGapMet') is None:
+            return None
+        value={'solution':rp.solution, 'selectorErrors':rp.selectorErrors, 'modelStats':rp.modelStats}
+        return [pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)]
+
+    def decode(self, row):
+        #{'solution', 'selectorErrors', 'modelStats'}
+        return pickle.loads(row[0])
@@ -1,30 +1,146 @@
 import os
+import asyncio
 import subprocess
+import sys
 import time
 os.chdir(os.path.dirname(os.path.realpath(__file__)))
 from dataList import dataList
 
-def runPerseeBatch(loc:str, bat:str, nameFbsfLog="FbsfFramework.log") -> int:
+#markers of the Persee log looked for after each run
+timeLimitMarker="Best Feasible (TimeLimit Reached)"
+unknownMarker="Resultat optim :  \"Unknown\""
+
+def runPerseeBatch(loc:str, bat:str, nameFbsfLog="FbsfFramework.log", appendLog=False) -> int:
     """Author: Etienne Cuisinier (etienne.cuisinier@cea.fr)
-	Runs Persee and returns the computation time (sec)"""
+	Runs Persee and returns the computation time (sec)
+	A python script (.py) can be given instead of the batch file, it is run with the current python interpreter (e.g. perseeStandIn.py)
+	If the log file is not rewritten but appended to at each run (appendLog), only the part written by the current run is read"""
     
     t0Simu=time.perf_counter()
     os.chdir(loc)
+    
+    offset=0
+    if appendLog and os.path.isfile(nameFbsfLog):
+        offset=os.path.getsize(nameFbsfLog)
+    
     #running Persee
     try:
-        subprocess.check_output("call "+bat,shell=True,stderr=subprocess.STDOUT)
+        if bat[-3:]=='.py':
+            subprocess.check_output([sys.executable,bat],stderr=subprocess.STDOUT)
+        else:
+            subprocess.check_output("call "+bat,shell=True,stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError:
         print("ERROR when running Persee")
 
     timeSimu = time.perf_counter() - t0Simu
-       
-    logFile=dataList(nameFbsfLog,loc)
-    if (logFile.findParam("Best Feasible (TimeLimit Reached)", warning=False)[1]!='notFound'):
+    
+    return perseeStatus(nameFbsfLog, timeSimu, offset)
+
+async def runPerseeAsync(loc:str, bat:str, nameFbsfLog="FbsfFramework.log", timeout=None, semaphore=None, appendLog=False) -> float:
+    """Asynchronous version of runPerseeBatch (to be awaited), so that several Persee runs can be in flight from one process.
+	Each run in flight must use its own folder 'loc' (the current directory is not changed).
+	The run is killed if it lasts more than 'timeout' seconds (it is then considered as failed, -3) or if the task is cancelled,
+	the number of runs in flight can be limited by an asyncio.Semaphore shared by the runs.
+	Returns the computation time (sec), -1 if the time limit of the solver was reached, -2 if no solution was found, -3 if the run was stopped"""
+    
+    if semaphore is not None:
+        async with semaphore:
+            return await runPerseeAsync(loc, bat, nameFbsfLog, timeout, None, appendLog)
+    
+    t0Simu=time.perf_counter()
+    logPath=os.path.join(loc,nameFbsfLog)
+    
+    offset=0
+    if appendLog and os.path.isfile(logPath):
+        offset=os.path.getsize(logPath)
+    
+    #running Persee
+    if bat[-3:]=='.py':
+        command=[sys.executable,bat]
+    else:
+        command=['cmd','/c','call',bat]
+    process=await asyncio.create_subprocess_exec(*command, cwd=loc, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+    try:
+        await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await killProcess(process)
+        print("TIMEOUT when running Persee, the run was stopped after",timeout,"seconds")
+        return -3
+    except asyncio.CancelledError:
+        await killProcess(process)
+        raise
+    if process.returncode != 0:
+        print("ERROR when running Persee")
+    
+    timeSimu = time.perf_counter() - t0Simu
+    
+    return perseeStatus(logPath, timeSimu, offset)
+
+async def killProcess(process):
+    #the whole process tree is killed on Windows (the batch file launches Persee in a child process)
+    if process.returncode is None:
+        try:
+            if os.name == 'nt':
+                subprocess.run(['taskkill','/F','/T','/PID',str(process.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+def perseeStatus(logPath:str, timeSimu:float, offset=0) -> float:
+    #looking for the markers of the time limit and of unfeasible problems in the log written by the run
+    
+    #the log file may have been rewritten since the previous run
+    if offset > os.path.getsize(logPath):
+        offset=0
+    found=scanFile(logPath, [timeLimitMarker, unknownMarker], offset)
+    if timeLimitMarker in found:
         print("TIME LIMIT REACHED at some steps")
         timeSimu=-1
-    if (logFile.findParam("Resultat optim :  \"Unknown\"", warning=False)[1]!='notFound'):
+    if unknownMarker in found:
         print("NO SOLUTION at some steps")
         timeSimu=-2
     
     return timeSimu
 
+def scanFile(path:str, markers, offset=0, chunkSize=1<<16) -> set:
+    """Looks for several markers in a file in a single pass, reading it by chunks from the given offset (bytes)
+	and stopping as soon as all markers are found. Returns the set of markers found"""
+    
+    encoded={marker:marker.encode('utf-8') for marker in markers}
+    overlap=max([len(marker) for marker in encoded.values()]+[1])-1
+    found=set()
+    
+    file=open(path,'rb')
+    try:
+        file.seek(offset)
+        tail=b''
+        while len(found) < len(encoded):
+            chunk=file.read(chunkSize)
+            if not chunk:
+                break
+            #the end of the previous chunk is kept, so that markers split between two chunks are found
+            block=tail+chunk
+            for marker in encoded:
+                if marker not in found and encoded[marker] in block:
+                    found.add(marker)
+            tail=block[-overlap:] if overlap > 0 else b''
+    finally:
+        file.close()
+    
+    return found
+
+def readPlanValue(loc:str, namePLAN:str, param:str) -> str:
+    """Reads the value of a parameter in a Persee PLAN file (same value as dataList.findParamValue with ignoreComments=False),
+	the file is read line by line and only up to the first line containing the parameter. Returns 'notFound' if it is absent"""
+    
+    file=open(os.path.join(loc,namePLAN),'r')
+    try:
+        for line in file:
+            if param in line:
+                return dataList(namePLAN,loc,liste=[line.rstrip('\n')]).findParamValue(param,ignoreComments=False)
+    finally:
+        file.close()
+    
+    return 'notFound'
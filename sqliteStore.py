@@ -0,0 +1,143 @@
+import os
+import time
+import hashlib
+import sqlite3
+
+def contentKey(contents):
+    #hash of the contents (list of strings, bytes or numpy arrays, the order matters), each content is prefixed by its length
+    h=hashlib.sha256()
+    for content in contents:
+        if hasattr(content, 'tobytes'):
+            content=str(content.dtype).encode('ascii')+str(content.shape).encode('ascii')+content.tobytes()
+        elif type(content) != bytes:
+            content=str(content).encode('utf-8')
+        h.update(str(len(content)).encode('ascii')+b':')
+        h.update(content)
+    return h.hexdigest()
+
+class sqliteStore:
+
+    """A persistent (on disk) store in a SQLite file, shared by the caches and stores of the cost functions computation (lruStore, stageStore).
+        The file (and its folder) is created if needed, with the tables of the store. The connection is opened when needed, in WAL mode so that
+        several processes can use the same file, and it is not sent to other processes (each process opens its own).
+        Counters (hits and misses) can be kept in the file itself, so that several processes using the same store are all accounted for.
+        The class is composed of the following attributes:
+
+            - the location of the store (a SQLite file): path
+            - the connection to the store, opened when needed (not shared between processes): connection
+    """
+
+    def __init__(self, path, tables=[], counters=[]):
+
+        self.path=str(path)
+        self.connection=None
+
+        if os.path.dirname(self.path)!='' and not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+
+        connection=self.connect()
+        with connection:
+            for table in tables:
+                connection.execute(table)
+            if len(counters) > 0:
+                connection.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+                for name in counters:
+                    connection.execute("INSERT OR IGNORE INTO counters VALUES (?,0)", (name,))
+
+    def __getstate__(self):
+        #the connection is not sent to other processes, each process opens its own
+        state=self.__dict__.copy()
+        state['connection']=None
+        return state
+
+    def connect(self):
+        if self.connection is None:
+            self.connection=sqlite3.connect(self.path, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        return self.connection
+
+    def key(self, contents):
+        return contentKey(contents)
+
+    def increment(self, connection, name):
+        #to be called in a transaction of the connection
+        connection.execute("UPDATE counters SET value=value+1 WHERE name=?", (name,))
+
+    def readCounters(self):
+        return dict(self.connect().execute("SELECT name, value FROM counters").fetchall())
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection=None
+
+class lruStore(sqliteStore):
+
+    """A persistent (on disk) cache in a table of a SQLite file, whose least recently used entries are removed first (base of perseeCache and rpCache).
+        Each entry is a row of the table: the key, the values of the entry (in the columns given) and the time of its last use.
+        Hits and misses are counted in the file, so that several processes using the same cache are all accounted for.
+        The caches only define their keys and how their entries are encoded into the columns (encode) and decoded from them (decode).
+        The class is composed of the following attributes:
+
+            - the location of the cache (a SQLite file): path
+            - the connection to the cache, opened when needed (not shared between processes): connection
+            - the table of the entries and its columns (name and type, without the key and the time of last use): table, columns
+            - the maximum number of entries: maxEntries
+    """
+
+    def __init__(self, path, table, columns, maxEntries=100000):
+
+        self.table=table
+        self.columns=columns
+        self.maxEntries=maxEntries
+        sqliteStore.__init__(self, path, ["CREATE TABLE IF NOT EXISTS "+table+" (key TEXT PRIMARY KEY, "+", ".join(columns)+", lastUse REAL)",
+                                          "CREATE INDEX IF NOT EXISTS "+table+"LastUse ON "+table+" (lastUse)"], ['hits','misses'])
+
+    def encode(self, *value):
+        #values of the columns for an entry, None if the entry is not to be stored
+        return value
+
+    def decode(self, row):
+        return row
+
+    def get(self, key):
+        #returns the decoded entry if it is in the cache, None otherwise
+        names=", ".join([column.split()[0] for column in self.columns])
+        connection=self.connect()
+        with connection:
+            row=connection.execute("SELECT "+names+" FROM "+self.table+" WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self.increment(connection, 'misses')
+                return None
+            connection.execute("UPDATE "+self.table+" SET lastUse=? WHERE key=?", (time.time(), key))
+            self.increment(connection, 'hits')
+        return self.decode(row)
+
+    def put(self, key, *value):
+        row=self.encode(*value)
+        if row is None:
+            return
+        connection=self.connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO "+self.table+" VALUES (?,"+"?,"*len(row)+"?)", (key,)+tuple(row)+(time.time(),))
+
+            #removing the least recently used entries
+            nbEntries=connection.execute("SELECT COUNT(*) FROM "+self.table).fetchone()[0]
+            if nbEntries > self.maxEntries:
+                connection.execute("DELETE FROM "+self.table+" WHERE key IN (SELECT key FROM "+self.table+" ORDER BY lastUse LIMIT ?)", (nbEntries-self.maxEntries,))
+
+    def stats(self, start=None):
+        #hits, misses and number of entries; the counters are shared by all the computations using the cache,
+        #with the stats read at the start of a computation ('start'), only their increase during the computation is given
+        counters=self.readCounters()
+        if start is not None:
+            for name in ['hits','misses']:
+                counters[name]-=start[name]
+        counters['entries']=self.connect().execute("SELECT COUNT(*) FROM "+self.table).fetchone()[0]
+        return counters
+
+    def clear(self):
+        connection=self.connect()
+        with connection:
+            connection.execute("DELETE FROM "+self.table)
+            connection.execute("UPDATE counters SET value=0")
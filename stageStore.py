@@ -0,0 +1,52 @@
+import pickle
+from sqliteStore import sqliteStore
+
+class stageStore(sqliteStore):
+
+    """A persistent (on disk) store of the results of each stage of the cost functions computation, to only recompute what changed.
+        Results are stored per stage and per period, keyed by a hash of all the inputs they depend on (key: list of strings, bytes or numpy arrays):
+
+            - 'rp': representative periods of a period (data of the period, parameters of the representative periods)
+            - 'points': cost function points of a period (representative periods of the period and their data files, storage deltas,
+              Persee files, parameters of the cost functions computation)
+            - 'mixed': mixed curves of a period (cost functions of the period and of the next one)
+
+        The class is composed of the following attributes:
+
+            - the location of the store (a SQLite file): path
+            - the connection to the store, opened when needed (not shared between processes): connection
+            - the number of results reused and computed in each stage since the store was opened: counters
+    """
+
+    def __init__(self, path):
+
+        sqliteStore.__init__(self, path, ["CREATE TABLE IF NOT EXISTS stages (stage TEXT, key TEXT, value BLOB, PRIMARY KEY (stage, key))"])
+        self.counters={}
+
+    def get(self, stage, key):
+        #returns the stored result, None if there is none
+        row=self.connect().execute("SELECT value FROM stages WHERE stage=? AND key=?", (stage, key)).fetchone()
+        if row is None:
+            self.count(stage, 'computed')
+            return None
+        self.count(stage, 'reused')
+        return pickle.loads(row[0])
+
+    def put(self, stage, key, value):
+        connection=self.connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO stages VALUES (?,?,?)", (stage, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def count(self, stage, name):
+        if stage not in self.counters:
+            self.counters[stage]={'reused':0, 'computed':0}
+        self.counters[stage][name]+=1
+
+    def stats(self, stage):
+        return self.counters.get(stage, {'reused':0, 'computed':0})
+
+    def clear(self):
+        connection=self.connect()
+        with connection:
+            connection.execute("DELETE FROM stages")
+        self.counters={}